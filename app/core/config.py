@@ -4,7 +4,16 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def getenv_bool(name: str, default: bool) -> bool:
+    value = getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes')
+
+
 DB_ENGINE = 'postgresql+psycopg2'
+ASYNC_DB_ENGINE = 'postgresql+asyncpg'
 POSTGRES_USER = getenv('POSTGRES_USER')
 POSTGRES_PASSWORD = getenv('POSTGRES_PASSWORD')
 POSTGRES_DB = getenv('POSTGRES_DB')
@@ -17,7 +26,59 @@ DATABASE_URL = (
     f"{POSTGRES_PORT}/"
     f"{POSTGRES_DB}"
 )
+ASYNC_DATABASE_URL = DATABASE_URL.replace(DB_ENGINE, ASYNC_DB_ENGINE, 1)
+# false - запросы эндпоинтов идут через psycopg2 в threadpool вместо asyncpg
+DB_ASYNC = getenv_bool('DB_ASYNC', True)
+
+DB_POOL_SIZE = int(getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(getenv('DB_POOL_TIMEOUT', 30))
+# Соединения старше DB_POOL_RECYCLE секунд пересоздаются, pre-ping отсеивает разорванные после рестарта Postgres
+DB_POOL_RECYCLE = int(getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = getenv_bool('DB_POOL_PRE_PING', True)
+# Сколько соединений открыть при старте приложения
+DB_POOL_WARMUP = int(getenv('DB_POOL_WARMUP', DB_POOL_SIZE))
+# PgBouncer в transaction mode: отключает кэш prepared statements у asyncpg
+DB_PGBOUNCER = getenv_bool('DB_PGBOUNCER', False)
 
 SECRET_KEY = getenv('SECRET_KEY')
 ALGORITHM = getenv('ALGORITHM')
 ACCESS_TOKEN_EXPIRE_MINUTES = int(getenv('ACCESS_TOKEN_EXPIRE_MINUTES'))
+
+JOB_WORKERS = int(getenv('JOB_WORKERS', 2))
+# xlsx - один файл с листами History/Items/Users, csv.gz - по файлу на таблицу
+EXPORT_FORMAT = getenv('EXPORT_FORMAT', 'xlsx')
+
+AUTH_CACHE_TTL_SECONDS = int(getenv('AUTH_CACHE_TTL_SECONDS', 60))
+AUTH_CACHE_MAX_SIZE = int(getenv('AUTH_CACHE_MAX_SIZE', 1024))
+
+# Порог word_similarity для поиска товаров с опечатками (fuzzy=true), 0..1
+ITEM_SEARCH_FUZZY_THRESHOLD = float(getenv('ITEM_SEARCH_FUZZY_THRESHOLD', 0.4))
+
+# Партиции history создаются на столько месяцев вперёд
+HISTORY_PARTITIONS_AHEAD = int(getenv('HISTORY_PARTITIONS_AHEAD', 2))
+# Месяцы старше стольких полных месяцев выгружаются в архив и отсоединяются, 0 - хранить всё
+HISTORY_RETENTION_MONTHS = int(getenv('HISTORY_RETENTION_MONTHS', 0))
+HISTORY_ARCHIVE_DIR = getenv('HISTORY_ARCHIVE_DIR', 'history_archive')
+
+# Сколько последних дней sales_daily ночная задача пересобирает из history
+SALES_DAILY_CATCH_UP_DAYS = int(getenv('SALES_DAILY_CATCH_UP_DAYS', 2))
+
+# Журнал медленных запросов: выключен по умолчанию
+SLOW_QUERY_LOG = getenv_bool('SLOW_QUERY_LOG', False)
+SLOW_QUERY_THRESHOLD_MS = float(getenv('SLOW_QUERY_THRESHOLD_MS', 200))
+# Доля медленных запросов, для которых снимается EXPLAIN (он повторно выполняет SELECT)
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(getenv('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', 0.1))
+SLOW_QUERY_LOG_FILE = getenv('SLOW_QUERY_LOG_FILE', 'slow_queries.log')
+SLOW_QUERY_LOG_MAX_BYTES = int(getenv('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024))
+SLOW_QUERY_LOG_BACKUPS = int(getenv('SLOW_QUERY_LOG_BACKUPS', 5))
+ADMIN_ROLE = getenv('ADMIN_ROLE', 'admin')
+
+# Сколько часов хранится ответ на запрос с Idempotency-Key; после этого ключ можно использовать заново
+IDEMPOTENCY_KEY_TTL_HOURS = int(getenv('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+# Предельный размер файла поставки для POST /items/import/
+STOCK_IMPORT_MAX_BYTES = int(getenv('STOCK_IMPORT_MAX_BYTES', 50 * 1024 * 1024))
+
+# Каталог с прайс-листами price.xlsx/price_default.xlsx и их manifest.json
+PRICELIST_DIR = getenv('PRICELIST_DIR', 'pricelist')
@@ -4,9 +4,11 @@ from app.core.security.tokens import verify_token
 
 
 class JWTBearer(HTTPBearer):
-    def __init__(self, auto_error: bool = True, expected_token_type: str = "access"):
+    def __init__(self, auto_error: bool = True, expected_token_type: str = "access", verify: bool = True):
         super().__init__(auto_error=auto_error)
         self.expected_token_type = expected_token_type
+        # verify=False - вернуть сам токен, проверку делает вызывающий (см. get_current_user)
+        self.verify = verify
 
     async def __call__(self, request: Request):
         credentials: HTTPAuthorizationCredentials = await super().__call__(request)
@@ -16,6 +18,8 @@ class JWTBearer(HTTPBearer):
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="Invalid authentication scheme."
                 )
+            if not self.verify:
+                return credentials.credentials
             try:
                 payload = verify_token(credentials.credentials)
                 return payload
@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import AUTH_CACHE_MAX_SIZE, AUTH_CACHE_TTL_SECONDS
+
+
+class AuthCache:
+    # LRU токен -> пользователь. Запись живёт не дольше ttl и не дольше срока действия токена.
+    # Кэш свой у каждого процесса, поэтому после смены пароля в другом воркере
+    # устаревшая запись продержится максимум ttl секунд.
+    def __init__(self, ttl: int, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, token: str):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self.entries[token]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, token: str, user, token_expires_at: float):
+        expires_at = min(time.time() + self.ttl, token_expires_at)
+        with self.lock:
+            self.entries[token] = (user, expires_at)
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_user(self, username: str):
+        with self.lock:
+            tokens = [token for token, (user, _) in self.entries.items() if user.username == username]
+            for token in tokens:
+                del self.entries[token]
+            self.invalidations += len(tokens)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+auth_cache = AuthCache(AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_MAX_SIZE)
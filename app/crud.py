@@ -1,27 +1,147 @@
-from sqlalchemy.orm import Session
+from typing import List
 
+from fastapi import HTTPException
+from sqlalchemy import Integer, column, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.security.auth_cache import auth_cache
+from app.models.history import History
+from app.models.history_line import HistoryLine
+from app.models.item import Item
 from app.models.user_model import User
+from app.schemas.item_schemas import ItemCreate, ItemSell
 from app.schemas.user_schemas import UserCreate
+from app.utils.sales_daily import rollup_upsert
 
 
-def create_user(db: Session, user: UserCreate):
+async def create_user(db: AsyncSession, user: UserCreate):
     hashed_password = user.password
     db_user = User(username=user.username, password=hashed_password, role=user.role)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    auth_cache.invalidate_user(db_user.username)
     return db_user
 
 
-def get_user_by_username(db: Session, username: str):
-    return db.query(User).filter(User.username == username).first()
+async def get_user_by_username(db: AsyncSession, username: str):
+    return await db.scalar(select(User).where(User.username == username))
 
 
-def change_password(db: Session, user_id: int, new_password: str):
-    db_user = db.query(User).filter(User.id == user_id).first()
+async def change_password(db: AsyncSession, user_id: int, new_password: str):
+    db_user = await db.get(User, user_id)
     if not db_user:
         return None
-    db.query(User).filter(User.id == user_id).update({"password": new_password})
-    db.commit()
+    db_user.password = new_password
+    await db.commit()
+    auth_cache.invalidate_user(db_user.username)
     return db_user
 
+
+def history_item_names(*changes):
+    names = dict.fromkeys(item["name"] for change in changes if change for item in change)
+    return "\n".join(names)
+
+
+def history_lines(history_entry: History, item_ids, lines):
+    return [
+        HistoryLine(
+            history_id=history_entry.id,
+            item_id=item_ids.get(line["name"]),
+            name=line["name"],
+            quantity=line.get("quantity"),
+            price=line.get("price"),
+            history_type=history_entry.history_type,
+            timestamp=history_entry.timestamp,
+        )
+        for line in lines
+    ]
+
+
+# Запись в history вместе со строками history_lines и итогами дня в sales_daily, в текущей транзакции.
+# lines по умолчанию - позиции after_change; item_ids - {name: items.id}
+async def add_history(db: AsyncSession, item_ids, lines=None, **fields):
+    if lines is None:
+        lines = fields.get("after_change") or []
+
+    history_entry = History(
+        item_names=history_item_names(fields.get("before_change"), fields.get("after_change")), **fields
+    )
+    db.add(history_entry)
+    await db.flush()
+    db.add_all(history_lines(history_entry, item_ids, lines))
+    await db.execute(rollup_upsert(history_entry))
+    return history_entry
+
+
+async def delete_history(db: AsyncSession, history_entry: History):
+    await db.execute(rollup_upsert(history_entry, sign=-1))
+    await db.delete(history_entry)
+
+
+# Все позиции поставки одним INSERT ... ON CONFLICT; коммит остаётся за вызывающим
+async def upsert_items(db: AsyncSession, items: List[ItemCreate]):
+    merged = {}
+    for item in items:
+        if item.name in merged:
+            # Повтор в одной поставке: количество суммируем, цена - последняя
+            merged[item.name]["quantity"] += item.quantity
+            merged[item.name]["price"] = item.price
+        else:
+            merged[item.name] = item.dict()
+
+    if not merged:
+        return {}
+
+    stmt = insert(Item).values(list(merged.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Item.name],
+        set_={"quantity": Item.quantity + stmt.excluded.quantity, "price": stmt.excluded.price},
+    ).returning(Item.id, Item.name, Item.quantity, Item.price)
+    return {row["name"]: dict(row) for row in (await db.execute(stmt)).mappings()}
+
+
+# Списание по продаже: один SELECT ... FOR UPDATE и один условный UPDATE на все позиции.
+# quantity >= :n проверяется самим UPDATE под блокировкой строки, поэтому две
+# одновременные продажи одного товара не уводят остаток в минус.
+async def sell_items(db: AsyncSession, items: List[ItemSell]):
+    requested = {}
+    for item in items:
+        requested[item.name] = requested.get(item.name, 0) + item.quantity
+    if not requested:
+        return [], {}
+
+    # Строки блокируются в порядке id: встречные продажи [A, B] и [B, A] ждут друг друга, а не
+    # взаимоблокируются; UPDATE ниже идёт по уже захваченным строкам
+    found = {row.name: row for row in await db.execute(
+        select(Item.id, Item.name, Item.quantity).where(Item.name.in_(requested)).order_by(Item.id).with_for_update()
+    )}
+    missing = [name for name in requested if name not in found]
+    if missing:
+        await db.rollback()
+        names = ", ".join(f"'{name}'" for name in missing)
+        raise HTTPException(status_code=404, detail=f"Item {names} not found")
+
+    sale_lines = values(
+        column("id", Integer), column("quantity", Integer), name="sale_lines"
+    ).data(sorted((found[name].id, quantity) for name, quantity in requested.items()))
+    stmt = (
+        update(Item)
+        .where(Item.id == sale_lines.c.id, Item.quantity >= sale_lines.c.quantity)
+        .values(quantity=Item.quantity - sale_lines.c.quantity)
+        .returning(Item.id, Item.name, Item.quantity, Item.price)
+    )
+    sold = {row.name: row for row in await db.execute(stmt, execution_options={"synchronize_session": False})}
+
+    short = [name for name in requested if name not in sold]
+    if short:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail={
+            "message": "Not enough items in stock",
+            "items": [{"name": name, "requested": requested[name], "available": found[name].quantity}
+                      for name in short],
+        })
+
+    sale_items = [{"name": item.name, "quantity": item.quantity, "price": sold[item.name].price} for item in items]
+    return sale_items, {name: row.id for name, row in sold.items()}
@@ -1,4 +1,8 @@
 from app.dependencies.database.database import Base
 from app.models.user_model import Base
 from app.models.item import Base
-from app.models.history import Base
\ No newline at end of file
+from app.models.history import Base
+from app.models.history_line import Base
+from app.models.inventory_totals import Base
+from app.models.sales_daily import Base
+from app.models.idempotency_key import Base
@@ -1,15 +1,57 @@
+import logging
+from contextlib import asynccontextmanager
 from typing import Annotated
+from uuid import uuid4
 
 from fastapi import Depends
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from starlette.concurrency import run_in_threadpool
 
-from app.core.config import DATABASE_URL
+from app.core.config import (
+    ASYNC_DATABASE_URL, DATABASE_URL, DB_ASYNC, DB_MAX_OVERFLOW, DB_PGBOUNCER, DB_POOL_PRE_PING, DB_POOL_RECYCLE,
+    DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_WARMUP, SLOW_QUERY_LOG
+)
+from app.dependencies.database.pool import TrackedAsyncAdaptedQueuePool, TrackedQueuePool, track_pool
+from app.utils.metrics import instrument_engine
+from app.utils.slow_queries import profile_engine
 
-engine = create_engine(DATABASE_URL)
+logger = logging.getLogger(__name__)
+
+POOL_OPTIONS = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+# PgBouncer в transaction mode не держит prepared statements между транзакциями
+ASYNC_CONNECT_ARGS = dict(
+    statement_cache_size=0,
+    prepared_statement_cache_size=0,
+    prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+) if DB_PGBOUNCER else {}
+
+engine = create_engine(DATABASE_URL, poolclass=TrackedQueuePool, **POOL_OPTIONS)
+track_pool(engine)
+instrument_engine(engine)
+if SLOW_QUERY_LOG:
+    profile_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = None
+if DB_ASYNC:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, poolclass=TrackedAsyncAdaptedQueuePool, connect_args=ASYNC_CONNECT_ARGS, **POOL_OPTIONS
+    )
+    track_pool(async_engine.sync_engine)
+    instrument_engine(async_engine.sync_engine)
+    if SLOW_QUERY_LOG:
+        profile_engine(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -21,4 +63,132 @@ def get_db():
         db.close()
 
 
-db_dependency = Annotated[Session, Depends(get_db)]
\ No newline at end of file
+class ThreadedResult:
+    # Результат stream() для ThreadedSession: порции серверного курсора читаются в threadpool
+    def __init__(self, result):
+        self.result = result
+
+    async def partitions(self, size: int = None):
+        partitions = self.result.partitions(size)
+        while True:
+            rows = await run_in_threadpool(next, partitions, None)
+            if rows is None:
+                return
+            yield rows
+
+
+class ThreadedSession:
+    # Интерфейс AsyncSession поверх обычной Session: каждый запрос выполняется в threadpool.
+    # Используется при DB_ASYNC=false, чтобы эндпоинты не блокировали event loop и psycopg2.
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, *args, **kwargs)
+
+    async def stream(self, statement, params=None):
+        result = await run_in_threadpool(
+            self.sync_session.execute, statement, params, execution_options={"stream_results": True}
+        )
+        return ThreadedResult(result)
+
+    async def scalars(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def refresh(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.refresh, *args, **kwargs)
+
+    async def delete(self, instance):
+        return await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self):
+        return await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        return await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        return await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        return await run_in_threadpool(self.sync_session.close)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+
+@asynccontextmanager
+async def async_session_scope():
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = ThreadedSession(SessionLocal(expire_on_commit=False))
+        try:
+            yield db
+        finally:
+            await db.close()
+
+
+# Открывает DB_POOL_WARMUP соединений разом, чтобы первые запросы не платили за connect
+async def warm_up_pool():
+    connections = []
+    try:
+        if DB_ASYNC:
+            for _ in range(DB_POOL_WARMUP):
+                connection = await async_engine.connect()
+                connections.append(connection)
+                await connection.execute(text("SELECT 1"))
+        else:
+            await run_in_threadpool(_warm_up_sync_pool)
+    except Exception:
+        logger.exception("Database pool warm-up failed")
+    finally:
+        for connection in connections:
+            await connection.close()
+
+
+def _warm_up_sync_pool():
+    connections = []
+    try:
+        for _ in range(DB_POOL_WARMUP):
+            connection = engine.connect()
+            connections.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+async def get_async_db():
+    async with async_session_scope() as db:
+        yield db
+
+
+# Единица работы для пишущих эндпоинтов: обработчик только пишет и делает flush, а одна фиксация
+# на весь запрос выполняется после его возврата (FastAPI закрывает зависимости до отправки ответа,
+# так что ошибка COMMIT доходит до клиента как 500). Исключение в обработчике откатывает всё.
+# Сессия та же, что у get_async_db, поэтому в транзакцию попадают и записи других зависимостей.
+async def get_unit_of_work(db: AsyncSession = Depends(get_async_db)):
+    try:
+        yield db
+    except Exception:
+        await db.rollback()
+        raise
+    await db.commit()
+
+
+db_dependency = Annotated[Session, Depends(get_db)]
+async_db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
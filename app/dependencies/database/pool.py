@@ -0,0 +1,101 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.connects = 0
+        self.connect_seconds_total = 0.0
+        self.connect_seconds_max = 0.0
+        self.invalidations = 0
+
+    def record_wait(self, seconds: float):
+        with self.lock:
+            self.waits += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def record_connect(self, seconds: float):
+        with self.lock:
+            self.connects += 1
+            self.connect_seconds_total += seconds
+            self.connect_seconds_max = max(self.connect_seconds_max, seconds)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_ms_total": round(self.wait_seconds_total * 1000, 1),
+                "wait_ms_max": round(self.wait_seconds_max * 1000, 1),
+                "connects": self.connects,
+                "connect_ms_avg": round(self.connect_seconds_total * 1000 / self.connects, 1) if self.connects else None,
+                "connect_ms_max": round(self.connect_seconds_max * 1000, 1),
+                "invalidations": self.invalidations,
+            }
+
+
+class WaitTrackingMixin:
+    # Считаем ожидание, только когда пул исчерпан (size + max_overflow занято) и checkout встаёт в очередь:
+    # overflow() на пределе бывает и при свободных соединениях в очереди, поэтому проверяем и её
+    stats: PoolStats
+
+    def _do_get(self):
+        if self._max_overflow < 0 or self.overflow() < self._max_overflow or not self._pool.empty():
+            return super()._do_get()
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.stats.record_wait(time.perf_counter() - started)
+
+
+def tracked_pool_class(base):
+    return type(f"Tracked{base.__name__}", (WaitTrackingMixin, base), {"stats": PoolStats()})
+
+
+TrackedQueuePool = tracked_pool_class(QueuePool)
+TrackedAsyncAdaptedQueuePool = tracked_pool_class(AsyncAdaptedQueuePool)
+
+
+def track_pool(engine):
+    stats = engine.pool.stats
+
+    @event.listens_for(engine, "do_connect")
+    def _before_connect(dialect, conn_rec, cargs, cparams):
+        conn_rec.info["connect_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "connect")
+    def _after_connect(dbapi_connection, connection_record):
+        started = connection_record.info.pop("connect_started", None)
+        if started is not None:
+            stats.record_connect(time.perf_counter() - started)
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        with stats.lock:
+            stats.checkouts += 1
+
+    @event.listens_for(engine, "invalidate")
+    def _invalidate(dbapi_connection, connection_record, exception):
+        with stats.lock:
+            stats.invalidations += 1
+
+
+def pool_status(engine):
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        **pool.stats.snapshot(),
+    }
@@ -1,17 +1,36 @@
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import ADMIN_ROLE
 from app.core.security.auth_bearer import JWTBearer
+from app.core.security.auth_cache import auth_cache
+from app.core.security.tokens import verify_token
 from app.models.user_model import User
-from app.dependencies.database.database import get_db
+from app.dependencies.database.database import get_async_db
+from app.schemas.user_schemas import User as ScUser
 
 
-async def get_current_user(db: Session = Depends(get_db),
-                           token: str = Depends(JWTBearer(expected_token_type="access"))):
-    username: str = token.get("sub")
+async def get_current_user(db: AsyncSession = Depends(get_async_db),
+                           token: str = Depends(JWTBearer(expected_token_type="access", verify=False))):
+    user = auth_cache.get(token)
+    if user is not None:
+        return user
+
+    payload = verify_token(token)
+    username: str = payload.get("sub")
     if username is None:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Could not validate credentials")
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
+    db_user = await db.scalar(select(User).where(User.username == username))
+    if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
+
+    user = ScUser(id=db_user.id, username=db_user.username, role=db_user.role)
+    auth_cache.set(token, user, payload["exp"])
     return user
+
+
+async def get_admin_user(current_user: ScUser = Depends(get_current_user)):
+    if current_user.role != ADMIN_ROLE:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin role required")
+    return current_user
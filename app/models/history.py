@@ -1,5 +1,6 @@
 from pytz import timezone, utc
-from sqlalchemy import Column, Integer, String, Text, DateTime, text
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from app.dependencies.database.database import Base
 
@@ -7,15 +8,31 @@ from app.dependencies.database.database import Base
 class History(Base):
     __tablename__ = "history"
 
-    id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    # Таблица партиционирована по месяцам timestamp (миграция 764118b73cfa), поэтому он входит в первичный ключ
+    timestamp = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     username = Column(String)
     buyer = Column(String, nullable=True)
     extra_info = Column(Text, nullable=True)
-    before_change = Column(Text, nullable=True)
-    after_change = Column(Text)
+    before_change = Column(JSONB(none_as_null=True), nullable=True)
+    after_change = Column(JSONB)
     history_type = Column(String)
     title = Column(String)
     total_unique_items_count = Column(Integer)
     total_items_count = Column(Integer)
     total_price = Column(Integer)
+    # Имена товаров из before_change/after_change через перевод строки - для поиска
+    item_names = Column(Text, nullable=True)
+
+    __table_args__ = tuple(
+        Index(f"ix_history_{column}_trgm", column, postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"})
+        for column in ("username", "buyer", "title", "extra_info", "history_type", "item_names")
+    ) + (
+        Index("ix_history_after_change", "after_change", postgresql_using="gin",
+              postgresql_ops={"after_change": "jsonb_path_ops"}),
+        Index("ix_history_timestamp_id", "timestamp", "id"),
+        Index("ix_history_history_type_timestamp_id", "history_type", "timestamp", "id"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+    # Для ORM запись по-прежнему определяется одним id: db.get(History, id) ищет во всех партициях
+    __mapper_args__ = {"primary_key": [id], "eager_defaults": True}
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, ForeignKeyConstraint, Index
+from app.dependencies.database.database import Base
+
+
+class HistoryLine(Base):
+    __tablename__ = "history_lines"
+
+    id = Column(Integer, primary_key=True, index=True)
+    history_id = Column(Integer, nullable=False, index=True)
+    item_id = Column(Integer, ForeignKey("items.id", ondelete="SET NULL"), nullable=True)
+    name = Column(String)
+    # Для add/sale/opt - количество в операции, для update - изменение остатка
+    quantity = Column(Integer)
+    price = Column(Float)
+    # Копии полей history, чтобы аналитика не делала join
+    history_type = Column(String)
+    timestamp = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_history_lines_item_id_timestamp", "item_id", "timestamp"),
+        Index("ix_history_lines_timestamp", "timestamp"),
+        # history партиционирована по timestamp, поэтому ссылка идёт на (id, timestamp)
+        ForeignKeyConstraint(["history_id", "timestamp"], ["history.id", "history.timestamp"],
+                             name="history_lines_history_id_fkey", ondelete="CASCADE"),
+    )
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, DateTime, func
+from sqlalchemy.dialects.postgresql import JSONB
+from app.dependencies.database.database import Base
+
+
+# Ответы POST-запросов с заголовком Idempotency-Key. Строка вставляется в транзакции самого
+# запроса, поэтому повтор с тем же ключом ждёт на уникальном индексе, пока первый не завершится.
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    username = Column(String, primary_key=True)
+    endpoint = Column(String, primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer)
+    response = Column(JSONB)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
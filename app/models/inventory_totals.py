@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, BigInteger, Float, CheckConstraint
+from app.dependencies.database.database import Base
+
+
+# Строк столько, сколько STRIPES в миграции 929550789f78
+TOTALS_STRIPES = 16
+
+
+# Итоги по складу, разложенные по TOTALS_STRIPES строкам (id = 1..TOTALS_STRIPES): statement-level
+# триггеры на items (миграции e73bb31f65c3, 929550789f78) прибавляют дельты к строке своего
+# соединения в той же транзакции, что и само изменение товаров. Итоги - суммы по всем строкам.
+class InventoryTotals(Base):
+    __tablename__ = "inventory_totals"
+
+    id = Column(Integer, primary_key=True)
+    unique_items_count = Column(BigInteger, nullable=False, default=0)
+    total_items_count = Column(BigInteger, nullable=False, default=0)
+    total_price = Column(Float, nullable=False, default=0)
+    # Растёт на каждое изменение items, по сумме версий воркеры сбрасывают кэш каталога
+    version = Column(BigInteger, nullable=False, server_default="0")
+
+    __table_args__ = (
+        CheckConstraint(f"id BETWEEN 1 AND {TOTALS_STRIPES}", name="ck_inventory_totals_stripe"),
+    )
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date
+from app.dependencies.database.database import Base
+
+
+# Итоги history по дням (UTC-день timestamp), типу операции и пользователю.
+# Обновляется в транзакции каждой записи history, пересобирается app.utils.sales_daily.
+class SalesDaily(Base):
+    __tablename__ = "sales_daily"
+
+    day = Column(Date, primary_key=True)
+    history_type = Column(String, primary_key=True)
+    username = Column(String, primary_key=True)
+    operations_count = Column(Integer, nullable=False, default=0)
+    unique_items_count = Column(BigInteger, nullable=False, default=0)
+    items_count = Column(BigInteger, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
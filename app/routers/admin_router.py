@@ -0,0 +1,29 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends
+
+from app.core.config import SLOW_QUERY_LOG, SLOW_QUERY_THRESHOLD_MS
+from app.dependencies.get_current_user import get_admin_user
+from app.schemas.user_schemas import User
+from app.utils.slow_queries import slow_query_log
+
+router = APIRouter(tags=['admin'])
+
+
+@router.get("/admin/slow-queries/")
+async def read_slow_queries(
+        limit: int = 20,
+        order_by: Literal["total_ms", "max_ms", "avg_ms", "count"] = "total_ms",
+        current_user: User = Depends(get_admin_user)
+):
+    return {
+        "enabled": SLOW_QUERY_LOG,
+        "threshold_ms": SLOW_QUERY_THRESHOLD_MS,
+        "statements": slow_query_log.top(limit, order_by),
+    }
+
+
+@router.delete("/admin/slow-queries/")
+async def reset_slow_queries(current_user: User = Depends(get_admin_user)):
+    slow_query_log.reset()
+    return {"message": "Success"}
@@ -0,0 +1,108 @@
+from datetime import date, datetime, time, timedelta
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+from pytz import utc
+from sqlalchemy import Date, cast, desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.dependencies.database.database import get_async_db
+from app.dependencies.get_current_user import get_current_user
+from app.models.history_line import HistoryLine
+from app.models.sales_daily import SalesDaily
+from app.models.user_model import User
+from app.schemas.analytics_schemas import DailySales, ItemSales, PeriodSales
+
+router = APIRouter(tags=['analytics'])
+
+SALE_TYPES = ["sale", "opt"]
+
+
+def filter_lines(query, date_from: Optional[date], date_to: Optional[date], history_type: List[str]):
+    # timestamp в history хранится уже со сдвигом +5 часов, поэтому границы дней берём в UTC
+    query = query.where(HistoryLine.history_type.in_(history_type))
+    if date_from:
+        query = query.where(HistoryLine.timestamp >= datetime.combine(date_from, time.min, utc))
+    if date_to:
+        query = query.where(HistoryLine.timestamp < datetime.combine(date_to + timedelta(days=1), time.min, utc))
+    return query
+
+
+def line_totals():
+    return (
+        func.sum(HistoryLine.quantity).label("quantity"),
+        func.coalesce(func.sum(HistoryLine.quantity * HistoryLine.price), 0).label("revenue"),
+        func.count(func.distinct(HistoryLine.history_id)).label("operations_count"),
+    )
+
+
+@router.get("/analytics/items/", response_model=List[ItemSales])
+async def sales_by_item(
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        history_type: List[str] = Query(SALE_TYPES),
+        limit: int = 100,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: User = Depends(get_current_user)
+):
+    totals = line_totals()
+    query = select(HistoryLine.item_id, HistoryLine.name, *totals)
+    query = filter_lines(query, date_from, date_to, history_type)
+    rows = await db.execute(
+        query.group_by(HistoryLine.item_id, HistoryLine.name)
+        .order_by(desc(totals[0]))
+        .limit(limit)
+    )
+    return rows.all()
+
+
+@router.get("/analytics/periods/", response_model=List[PeriodSales])
+async def sales_by_period(
+        period: Literal["day", "week", "month"] = "day",
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        history_type: List[str] = Query(SALE_TYPES),
+        item_id: Optional[int] = None,
+        db: AsyncSession = Depends(get_async_db),
+        current_user: User = Depends(get_current_user)
+):
+    bucket = func.date_trunc(period, func.timezone("UTC", HistoryLine.timestamp)).label("period")
+    query = select(bucket, *line_totals())
+    query = filter_lines(query, date_from, date_to, history_type)
+    if item_id is not None:
+        query = query.where(HistoryLine.item_id == item_id)
+    rows = await db.execute(query.group_by(bucket).order_by(bucket))
+    return rows.all()
+
+
+# Ряды по sales_daily: объём чтения зависит от числа дней в диапазоне, а не от размера history.
+# split_by разбивает ряд по типу операции и/или пользователю
+@router.get("/analytics/daily/", response_model=List[DailySales])
+async def daily_sales(
+        period: Literal["day", "week", "month"] = "day",
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        history_type: List[str] = Query(SALE_TYPES),
+        username: Optional[str] = None,
+        split_by: List[Literal["history_type", "username"]] = Query([]),
+        db: AsyncSession = Depends(get_async_db),
+        current_user: User = Depends(get_current_user)
+):
+    bucket = SalesDaily.day if period == "day" else cast(func.date_trunc(period, SalesDaily.day), Date)
+    keys = [bucket.label("period")] + [getattr(SalesDaily, column) for column in dict.fromkeys(split_by)]
+    query = select(
+        *keys,
+        func.sum(SalesDaily.operations_count).label("operations_count"),
+        func.sum(SalesDaily.unique_items_count).label("unique_items_count"),
+        func.sum(SalesDaily.items_count).label("items_count"),
+        func.sum(SalesDaily.revenue).label("revenue"),
+    ).where(SalesDaily.history_type.in_(history_type))
+    if date_from:
+        query = query.where(SalesDaily.day >= date_from)
+    if date_to:
+        query = query.where(SalesDaily.day <= date_to)
+    if username:
+        query = query.where(SalesDaily.username == username)
+
+    rows = await db.execute(query.group_by(*keys).order_by(*keys))
+    return rows.all()
@@ -0,0 +1,99 @@
+import logging
+import time
+
+from fastapi import APIRouter, Response, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import text
+
+from app.core.security.auth_cache import auth_cache
+from app.dependencies.database.database import async_engine, async_session_scope, engine
+from app.dependencies.database.pool import pool_status
+from app.utils.catalog_cache import catalog_cache
+from app.utils.jobs import job_runner
+from app.utils.metrics import metrics, render_prometheus
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=['health'])
+
+
+@router.get("/health")
+async def health(response: Response):
+    started = time.perf_counter()
+    try:
+        async with async_session_scope() as db:
+            await db.execute(text("SELECT 1"))
+        database = {"status": "ok"}
+    except Exception:
+        # /health открыт без авторизации: текст ошибки драйвера (хост, база, пользователь) только в лог
+        logger.exception("Health check database ping failed")
+        database = {"status": "error", "error": "unavailable"}
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    database["ping_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    # requests - пул эндпоинтов, jobs - синхронный пул задач расписания
+    pools = {"requests": pool_status(async_engine.sync_engine if async_engine else engine)}
+    if async_engine:
+        pools["jobs"] = pool_status(engine)
+
+    return {
+        "status": database["status"],
+        "database": database,
+        "pools": pools,
+        "auth_cache": auth_cache.stats(),
+        "catalog_cache": catalog_cache.stats(),
+    }
+
+
+
+# (метрика, тип, описание, ключ в статистике)
+POOL_METRICS = [
+    ("db_pool_size", "gauge", "Configured pool size", "size"),
+    ("db_pool_checked_out", "gauge", "Connections currently in use", "checked_out"),
+    ("db_pool_overflow", "gauge", "Connections opened above pool size", "overflow"),
+    ("db_pool_checkouts_total", "counter", "Connection checkouts", "checkouts"),
+    ("db_pool_waits_total", "counter", "Checkouts that waited for a free connection", "waits"),
+    ("db_pool_connects_total", "counter", "New database connections", "connects"),
+    ("db_pool_invalidations_total", "counter", "Invalidated connections", "invalidations"),
+    ("db_pool_wait_seconds_total", "counter", "Time spent waiting for a free connection", "wait_seconds_total"),
+]
+JOB_METRICS = [
+    ("job_runs_total", "counter", "Scheduled job runs", "runs"),
+    ("job_failures_total", "counter", "Failed scheduled job runs", "failures"),
+    ("job_skipped_total", "counter", "Runs skipped because the previous one was still running", "skipped"),
+    ("job_running", "gauge", "Whether the job is running now", "running"),
+    ("job_last_duration_seconds", "gauge", "Duration of the last run", "last_duration"),
+]
+CACHE_METRICS = [
+    ("auth_cache_hits_total", "counter", "Auth cache hits", "hits"),
+    ("auth_cache_misses_total", "counter", "Auth cache misses", "misses"),
+    ("auth_cache_evictions_total", "counter", "Auth cache evictions", "evictions"),
+]
+CATALOG_METRICS = [
+    ("catalog_cache_hits_total", "counter", "Catalog snapshot hits", "hits"),
+    ("catalog_cache_rebuilds_total", "counter", "Catalog snapshot rebuilds", "rebuilds"),
+]
+
+
+def labelled_families(definitions, label: str, stats_by_label):
+    return [
+        (name, metric_type, help_text,
+         [(name, {label: value} if label else {}, stats[key]) for value, stats in stats_by_label.items()])
+        for name, metric_type, help_text, key in definitions
+    ]
+
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    pools = {"requests": pool_status(async_engine.sync_engine if async_engine else engine)}
+    if async_engine:
+        pools["jobs"] = pool_status(engine)
+    for stats in pools.values():
+        stats["wait_seconds_total"] = stats["wait_ms_total"] / 1000
+
+    families = metrics.families()
+    families += labelled_families(POOL_METRICS, "pool", pools)
+    families += labelled_families(JOB_METRICS, "job", job_runner.snapshot())
+    families += labelled_families(CACHE_METRICS, None, {None: auth_cache.stats()})
+    families += labelled_families(CATALOG_METRICS, None, {None: catalog_cache.stats()})
+    return PlainTextResponse(render_prometheus(families), media_type="text/plain; version=0.0.4")
@@ -1,118 +1,138 @@
 import json
+import os
+from datetime import date, datetime
 
-from typing import List
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import desc, or_
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import desc, func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.dependencies.database.database import get_db
+from app import crud
+from app.dependencies.database.database import get_async_db, get_unit_of_work
 from app.dependencies.get_current_user import get_current_user
 from app.models.history import History
 from app.models.user_model import User
-from app.schemas.history_schemas import History as ScHistory
+from app.schemas.history_schemas import History as ScHistory, HistoryArchive
+from app.utils.history_export import GZIP_MEDIA_TYPE, MEDIA_TYPES, export_file_name, export_query, stream_history
+from app.utils.history_partitions import archive_path, list_archives, read_archive
+from app.utils.pagination import (
+    NEXT_CURSOR_HEADER, TOTAL_ESTIMATE_HEADER, decode_cursor, encode_cursor, estimate_count
+)
+from app.utils.text_search import escape_like
 
 router = APIRouter(tags=['history'])
 
 
+SEARCH_COLUMNS = (
+    History.username, History.buyer, History.title, History.extra_info, History.history_type, History.item_names
+)
+
+
 @router.get("/history/", response_model=List[ScHistory])
 async def read_history(
-        skip: int = 0, limit: int = 10, history_type: str = None, db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        response: Response, skip: int = 0, limit: int = 10, history_type: str = None, cursor: Optional[str] = None,
+        with_total: bool = False, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)
 ):
-    query = db.query(History).order_by(desc(History.timestamp))
+    query = select(History)
 
     if history_type:
-        query = query.filter(History.history_type == history_type)
-
-    history_entries = query.offset(skip).limit(limit).all()
-
-    corrected_history_entries = []
-    for entry in history_entries:
-        after_change_json = json.loads(entry.after_change.replace('\\"', ''))
-        if entry.before_change:
-            before_change_json = json.loads(entry.before_change.replace('\\"', ''))
-        else:
-            before_change_json = None
-        entry_dict = entry.__dict__
-        entry_dict["timestamp"] = entry_dict["timestamp"].isoformat()
-
-        corrected_entry = {
-            "username": entry_dict["username"],
-            "buyer": entry_dict["buyer"],
-            "extra_info": entry_dict["extra_info"],
-            "before_change": json.dumps(before_change_json, ensure_ascii=False),
-            "after_change": json.dumps(after_change_json, ensure_ascii=False),
-            "history_type": entry_dict["history_type"],
-            "title": entry_dict["title"],
-            "id": entry_dict["id"],
-            "timestamp": entry_dict["timestamp"],
-            "total_unique_items_count": entry_dict["total_unique_items_count"],
-            "total_items_count": entry_dict["total_items_count"],
-            "total_price": entry_dict["total_price"]
-        }
-        corrected_history_entries.append(ScHistory(**corrected_entry))
-
-    return corrected_history_entries
+        query = query.where(History.history_type == history_type)
+
+    if with_total:
+        response.headers[TOTAL_ESTIMATE_HEADER] = str(await estimate_count(db, query))
+
+    query = query.order_by(desc(History.timestamp), desc(History.id))
+    if cursor:
+        timestamp, last_id = decode_cursor(cursor, datetime, int)
+        query = query.where(tuple_(History.timestamp, History.id) < (timestamp, last_id))
+    else:
+        query = query.offset(skip)
+
+    history_entries = (await db.scalars(query.limit(limit))).all()
+    if history_entries and len(history_entries) == limit:
+        last_entry = history_entries[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last_entry.timestamp.isoformat(), last_entry.id)
+    return history_entries
 
 
 @router.get("/history/search/", response_model=List[ScHistory])
 async def search_history(
         query_string: str,
-        db: Session = Depends(get_db),
+        skip: int = 0,
+        limit: int = 50,
+        db: AsyncSession = Depends(get_async_db),
         current_user: User = Depends(get_current_user),
 ):
-    query = db.query(History).order_by(desc(History.timestamp))
-
-    corrected_history_entries = []
-    query_string = query_string.lower()
-    for entry in query:
-        if entry.before_change:
-            entry.before_change = json.loads(entry.before_change.replace('\\"', ''))
-        if entry.after_change:
-            entry.after_change = json.loads(entry.after_change.replace('\\"', ''))
-        if (
-                (entry.username and query_string in entry.username.lower()) or
-                (entry.buyer and query_string in entry.buyer.lower()) or
-                (entry.before_change and any(query_string in item['name'].lower() for item in entry.before_change)) or
-                (entry.after_change and any(query_string in item['name'].lower() for item in entry.after_change)) or
-                (entry.extra_info and query_string in entry.extra_info.lower()) or
-                (entry.history_type and query_string in entry.history_type.lower()) or
-                (entry.title and query_string in entry.title.lower())
-        ):
-            corrected_entry = {
-                "username": entry.username,
-                "buyer": entry.buyer,
-                "extra_info": entry.extra_info,
-                "before_change": json.dumps(entry.before_change, ensure_ascii=False) if entry.before_change else None,
-                "after_change": json.dumps(entry.after_change, ensure_ascii=False) if entry.after_change else None,
-                "history_type": entry.history_type,
-                "title": entry.title,
-                "id": entry.id,
-                "timestamp": entry.timestamp.isoformat(),
-                "total_unique_items_count": entry.total_unique_items_count,
-                "total_items_count": entry.total_items_count,
-                "total_price": entry.total_price
-            }
-            corrected_history_entries.append(ScHistory(**corrected_entry))
-
-    return corrected_history_entries
+    # ILIKE '%...%' обслуживается GIN-индексами gin_trgm_ops, ранжируем по word_similarity
+    pattern = f"%{escape_like(query_string)}%"
+    rank = func.greatest(*(func.word_similarity(query_string, column) for column in SEARCH_COLUMNS))
+
+    history_entries = await db.scalars(
+        select(History)
+        .where(or_(*(column.ilike(pattern, escape="\\") for column in SEARCH_COLUMNS)))
+        .order_by(desc(rank), desc(History.timestamp))
+        .offset(skip)
+        .limit(limit)
+    )
+    return history_entries.all()
+
+
+# Выгрузка диапазона history потоком: NDJSON или CSV, по желанию в gzip.
+# Первые строки уходят сразу, память сервера не зависит от размера диапазона
+@router.get("/history/export/")
+async def export_history(
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        history_type: Optional[List[str]] = Query(None),
+        file_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+        compress: bool = Query(False, alias="gzip"),
+        current_user: User = Depends(get_current_user)
+):
+    query = export_query(date_from, date_to, history_type)
+    file_name = export_file_name(date_from, date_to, file_format, compress)
+    return StreamingResponse(
+        stream_history(query, file_format, compress),
+        media_type=GZIP_MEDIA_TYPE if compress else MEDIA_TYPES[file_format],
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'},
+    )
+
+
+@router.get("/history/archive/")
+async def list_history_archives(current_user: User = Depends(get_current_user)):
+    return await run_in_threadpool(list_archives)
+
+
+# Месяцы, вынесенные из БД политикой хранения, читаются прямо из архивного файла
+@router.get("/history/archive/{month}/", response_model=List[HistoryArchive])
+async def read_history_archive(
+        month: str, skip: int = 0, limit: int = 10, history_type: str = None, query_string: str = None,
+        current_user: User = Depends(get_current_user)
+):
+    try:
+        archive_month = datetime.strptime(month, "%Y-%m").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Month must be in YYYY-MM format")
+    if not os.path.exists(archive_path(archive_month)):
+        raise HTTPException(status_code=404, detail="History archive not found")
+    return await run_in_threadpool(read_archive, archive_month, skip, limit, history_type, query_string)
 
 
 @router.delete("/history/{history_id}/")
-async def delete_history_entry(history_id: int, db: Session = Depends(get_db)):
-    history_entry = db.query(History).filter(History.id == history_id).first()
+async def delete_history_entry(history_id: int, db: AsyncSession = Depends(get_unit_of_work)):
+    history_entry = await db.get(History, history_id)
 
     if not history_entry:
         raise HTTPException(status_code=404, detail="History date not found")
 
-    db.delete(history_entry)
-    db.commit()
+    await crud.delete_history(db, history_entry)
 
     return {"message": "Success"}
 
 
-def fix_unicode_in_database(db: Session, json_data):
+async def fix_unicode_in_database(db: AsyncSession, json_data):
     # Парсим JSON данные
     try:
         data = json.loads(json_data)
@@ -128,12 +148,12 @@ def fix_unicode_in_database(db: Session, json_data):
             print(item['after_change'])
 
     # Сохраняем изменения
-    db.commit()
+    await db.commit()
 
 
 @router.post("/fix_unicode_in_database/")
-async def fix_unicode_in_database_endpoint(json_data: str, db: Session = Depends(get_db)):
-    fix_unicode_in_database(db, json_data)
+async def fix_unicode_in_database_endpoint(json_data: str, db: AsyncSession = Depends(get_async_db)):
+    await fix_unicode_in_database(db, json_data)
     return {"message": "Unicode в базе данных исправлено успешно"}
 
 
@@ -1,62 +1,60 @@
+import os
+import tempfile
 from typing import List, Dict, Union, Optional
-from sqlalchemy.orm import Session
-from fastapi import APIRouter, Depends, HTTPException, Body
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, HTTPException, Body, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from datetime import datetime, timedelta
 from pytz import utc
-import json
-from sqlalchemy import func
-from app.dependencies.database.database import get_db
-from app.models.history import History
+from sqlalchemy import desc, func, or_, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from app import crud
+from app.core.config import ITEM_SEARCH_FUZZY_THRESHOLD, STOCK_IMPORT_MAX_BYTES
+from app.dependencies.database.database import get_async_db, get_unit_of_work
 from app.models.item import Item
 from app.models.user_model import User
 from app.schemas.item_schemas import ItemCreate, ItemOut, ItemUpdate, RetailSale, WholesaleSale
 from app.dependencies.get_current_user import get_current_user
+from app.utils.catalog_cache import ETAG_HEADER, catalog_cache, etag_matches
+from app.utils.idempotency import Idempotency, get_idempotency
+from app.utils.inventory_totals import STORED_TOTALS, compute_inventory_totals
+from app.utils.pagination import (
+    NEXT_CURSOR_HEADER, TOTAL_ESTIMATE_HEADER, decode_cursor, encode_cursor, estimate_count
+)
+from app.utils.stock_import import (
+    StockImportError, copy_import, fill_import_history, import_totals, merge_import, prepare_import
+)
+from app.utils.text_search import escape_like, search_variants
 
 router = APIRouter(tags=['items'])
 
 
 @router.post("/items/", response_model=List[ItemOut])
-async def create_or_update_items(items: List[ItemCreate], db: Session = Depends(get_db),
-                                 current_user: User = Depends(get_current_user)):
-    created_or_updated_items = []
-    total_unique_items_count = 0
-    total_items_count = 0
-    total_price = 0
-
-    for item in items:
-        existing_item = db.query(Item).filter(Item.name == item.name).first()
-
-        if existing_item:
-            # Если товар уже существует, обновляем его количество и цену
-            existing_item.quantity += item.quantity
-            existing_item.price = item.price
-            db.add(existing_item)
-            db.commit()
-            db.refresh(existing_item)
-            created_or_updated_items.append(existing_item)
-        else:
-            # Если товара с таким именем еще нет, создаем новый
-            db_item = Item(**item.dict())
-            db.add(db_item)
-            db.commit()
-            db.refresh(db_item)
-            created_or_updated_items.append(db_item)
-
-        total_items_count += item.quantity
-        total_price += item.quantity * item.price
-
+async def create_or_update_items(items: List[ItemCreate], db: AsyncSession = Depends(get_unit_of_work),
+                                 current_user: User = Depends(get_current_user),
+                                 idempotency: Idempotency = Depends(get_idempotency)):
+    replay = await idempotency.claim(db, current_user.username, items)
+    if replay is not None:
+        return replay
+
+    upserted_items = await crud.upsert_items(db, items)
+    created_or_updated_items = [upserted_items[item.name] for item in items]
+
+    total_items_count = sum(item.quantity for item in items)
+    total_price = sum(item.quantity * item.price for item in items)
     total_unique_items_count = len(set(item.name for item in items))
 
     items_dict = [item.dict() for item in items]
-    after_change_json = json.dumps(items_dict, ensure_ascii=False)
 
     current_datetime = datetime.now(utc)
     shifted_datetime = current_datetime + timedelta(hours=5)
 
     title = f"{shifted_datetime.strftime('%d.%m.%Y')} | {current_user.username} | Добавление товара | {shifted_datetime.strftime('%H:%M')}"
-    history_entry = History(
+    await crud.add_history(
+        db,
+        item_ids={name: row["id"] for name, row in upserted_items.items()},
         username=current_user.username,
-        after_change=after_change_json,
+        after_change=items_dict,
         history_type="add",
         title=title,
         timestamp=shifted_datetime,
@@ -64,46 +62,149 @@ async def create_or_update_items(items: List[ItemCreate], db: Session = Depends(
         total_items_count=total_items_count,
         total_price=total_price
     )
-    db.add(history_entry)
-    db.commit()
+    await idempotency.store(db, created_or_updated_items)
 
     return created_or_updated_items
 
 
+# Поставка файлом CSV или XLSX в теле запроса (формат по умолчанию определяется по содержимому).
+# Строки проверяются потоком, грузятся COPY во временную таблицу и сливаются в items одним запросом;
+# в history одна запись "add" с итогами, history_lines - INSERT ... SELECT из той же таблицы.
+@router.post("/items/import/")
+async def import_items(request: Request, file_format: Optional[str] = Query(None, alias="format"),
+                       extra_info: Optional[str] = None, db: AsyncSession = Depends(get_unit_of_work),
+                       current_user: User = Depends(get_current_user)):
+    with tempfile.TemporaryDirectory(prefix="stock_import_") as directory:
+        upload_path = os.path.join(directory, "upload")
+        rows_path = os.path.join(directory, "rows.csv")
+        size = 0
+        with open(upload_path, "wb") as file:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > STOCK_IMPORT_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail="File is too large")
+                file.write(chunk)
+        try:
+            await run_in_threadpool(prepare_import, upload_path, rows_path, file_format)
+        except StockImportError as e:
+            raise HTTPException(status_code=422, detail={"message": e.message, "errors": e.errors})
+        await db.run_sync(copy_import, rows_path)
+
+    totals = await db.run_sync(import_totals)
+    merged = await db.run_sync(merge_import)
+
+    current_datetime = datetime.now(utc)
+    shifted_datetime = current_datetime + timedelta(hours=5)
+
+    title = f"{shifted_datetime.strftime('%d.%m.%Y')} | {current_user.username} | Импорт товара | {shifted_datetime.strftime('%H:%M')}"
+    history_entry = await crud.add_history(
+        db,
+        item_ids={},
+        lines=[],
+        username=current_user.username,
+        extra_info=extra_info,
+        history_type="add",
+        title=title,
+        timestamp=shifted_datetime,
+        total_unique_items_count=totals.unique_items_count,
+        total_items_count=totals.items_count,
+        total_price=totals.total_price
+    )
+    lines = await db.run_sync(fill_import_history, history_entry.id, history_entry.history_type, history_entry.timestamp)
+
+    return {"history_id": history_entry.id,
+            "lines": lines,
+            "created": merged.created,
+            "updated": merged.updated,
+            "unique_items_count": totals.unique_items_count,
+            "total_items_count": totals.items_count,
+            "total_price": totals.total_price}
+
+
 @router.get("/items/", response_model=List[ItemOut])
-async def read_items(skip: int = 0, limit: int = 10, db: Session = Depends(get_db),
-                     current_user: User = Depends(get_current_user)):
-    items = db.query(Item).order_by(Item.name).offset(skip).limit(limit).all()
+async def read_items(response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None,
+                     with_total: bool = False, if_none_match: Optional[str] = Header(None),
+                     db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    snapshot = await catalog_cache.get(db)
+    headers = {ETAG_HEADER: snapshot.etag}
+    if etag_matches(if_none_match, snapshot.etag):
+        return Response(status_code=304, headers=headers)
+
+    start = skip
+    if cursor:
+        name, last_id = decode_cursor(cursor, str, int)
+        start = snapshot.position_after(name, last_id)
+        if start is None:
+            # Товар из курсора удалён - продолжаем по индексу (name, id)
+            return await read_items_after(response, name, last_id, limit, with_total, db)
+
+    keys, body = snapshot.page(start, limit)
+    if with_total:
+        headers[TOTAL_ESTIMATE_HEADER] = str(len(snapshot.keys))
+    if keys and len(keys) == limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(*keys[-1])
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def read_items_after(response: Response, name, last_id, limit: int, with_total: bool, db: AsyncSession):
+    query = select(Item)
+    if with_total:
+        response.headers[TOTAL_ESTIMATE_HEADER] = str(await estimate_count(db, query))
+
+    query = query.where(tuple_(Item.name, Item.id) > (name, last_id)).order_by(Item.name, Item.id)
+    items = (await db.scalars(query.limit(limit))).all()
+    if items and len(items) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(items[-1].name, items[-1].id)
     return items
 
 
 @router.get("/items/summary/", response_model=Dict[str, Union[int, float]])
-async def get_items_summary(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    unique_items_count = db.query(Item).distinct(Item.name).count()
-    total_items_count = db.query(func.sum(Item.quantity)).scalar() or 0
-    total_price = db.query(func.sum(Item.price * Item.quantity)).scalar() or 0.0
+async def get_items_summary(db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    # Итоги поддерживают триггеры на items, здесь только сумма строк inventory_totals
+    totals = (await db.execute(STORED_TOTALS)).one()
+    if totals.unique_items_count is None:
+        return await db.run_sync(compute_inventory_totals)
 
-    return {"unique_items_count": unique_items_count,
-            "total_items_count": total_items_count,
-            "total_price": total_price}
+    return {"unique_items_count": totals.unique_items_count,
+            "total_items_count": totals.total_items_count,
+            "total_price": totals.total_price}
 
 
 @router.get("/items/search/", response_model=List[ItemOut])
-async def search_items_by_name(name: str, db: Session = Depends(get_db),
+async def search_items_by_name(name: str, skip: int = 0, limit: int = 20, fuzzy: bool = False,
+                               db: AsyncSession = Depends(get_async_db),
                                current_user: User = Depends(get_current_user)):
-    items = db.query(Item).filter(func.lower(Item.name).like(func.lower(f"%{name}%"))).all()
-    return items
+    # ILIKE '%...%' и %> обслуживаются GIN-индексом ix_items_name_trgm.
+    # Сначала названия, начинающиеся с запроса, затем по word_similarity
+    variants = search_variants(name) if fuzzy else [name]
+    conditions = [Item.name.ilike(f"%{escape_like(variant)}%", escape="\\") for variant in variants]
+    if fuzzy:
+        await db.execute(select(func.set_config(
+            "pg_trgm.word_similarity_threshold", str(ITEM_SEARCH_FUZZY_THRESHOLD), True
+        )))
+        conditions += [Item.name.op("%>")(variant) for variant in variants]
+
+    prefix = or_(*(Item.name.ilike(f"{escape_like(variant)}%", escape="\\") for variant in variants))
+    rank = func.greatest(*(func.word_similarity(variant, Item.name) for variant in variants))
+    items = await db.scalars(
+        select(Item)
+        .where(or_(*conditions))
+        .order_by(desc(prefix), desc(rank), Item.name, Item.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return items.all()
 
 
 @router.put("/items/{item_id}", response_model=List[ItemOut])
 async def update_item(
         item_id: int,
         item_update: ItemUpdate,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_unit_of_work),
         current_user: User = Depends(get_current_user),
         extra_info: Optional[str] = Body(None)
 ):
-    db_item = db.query(Item).filter(Item.id == item_id).first()
+    db_item = await db.get(Item, item_id)
     if not db_item:
         raise HTTPException(status_code=404, detail="Item not found")
 
@@ -117,26 +218,40 @@ async def update_item(
         "price": item_update.price,
         "quantity": item_update.quantity
     }]
+    # Название уникально (ON CONFLICT (name) в поставках): переименование в занятое название - 409, а не 500
+    if item_update.name != db_item.name and await db.scalar(
+            select(Item.id).where(Item.name == item_update.name, Item.id != item_id)
+    ):
+        raise HTTPException(status_code=409, detail=f"Item '{item_update.name}' already exists")
+
     for key, value in item_update.dict().items():
         setattr(db_item, key, value)
-    db.commit()
-    db.refresh(db_item)
+    # Одновременное переименование или поставка могли занять название после проверки
+    try:
+        await db.flush()
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail=f"Item '{item_update.name}' already exists")
 
     current_datetime = datetime.now(utc)
     shifted_datetime = current_datetime + timedelta(hours=5)
 
     title = f"{shifted_datetime.strftime('%d.%m.%Y')} | {current_user.username} | Изменения товара | {shifted_datetime.strftime('%H:%M')}"
-    history_entry = History(
+    await crud.add_history(
+        db,
+        item_ids={item_update.name: item_id},
+        lines=[{
+            "name": item_update.name,
+            "price": item_update.price,
+            "quantity": item_update.quantity - before_change[0]["quantity"]
+        }],
         username=current_user.username,
-        before_change=json.dumps(before_change),
-        after_change=json.dumps(after_change),
+        before_change=before_change,
+        after_change=after_change,
         history_type="update",
         extra_info=extra_info,
         title=title,
         timestamp=shifted_datetime
     )
-    db.add(history_entry)
-    db.commit()
 
     return [db_item]
 
@@ -145,21 +260,14 @@ async def update_item(
 async def sell_wholesale(
         wholesale_sale: WholesaleSale,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_unit_of_work),
+        idempotency: Idempotency = Depends(get_idempotency)
 ):
-    sale_items = []
-
-    for item_data in wholesale_sale.items:
-        db_item = db.query(Item).filter(Item.name == item_data.name).first()
-        if not db_item:
-            raise HTTPException(status_code=404, detail=f"Item '{item_data.name}' not found")
+    replay = await idempotency.claim(db, current_user.username, wholesale_sale)
+    if replay is not None:
+        return replay
 
-        if db_item.quantity < item_data.quantity:
-            raise HTTPException(status_code=400, detail=f"Not enough '{item_data.name}' in stock")
-
-        db_item.quantity -= item_data.quantity
-
-        sale_items.append({"name": db_item.name, "quantity": item_data.quantity, "price": db_item.price})
+    sale_items, item_ids = await crud.sell_items(db, wholesale_sale.items)
 
     total_unique_items_count = len(set(item['name'] for item in sale_items))
     total_items_count = sum(item['quantity'] for item in sale_items)
@@ -170,11 +278,13 @@ async def sell_wholesale(
 
     title = f"{shifted_datetime.strftime('%d.%m.%Y')} | {current_user.username} | Оптовая продажа | {wholesale_sale.buyer} |{shifted_datetime.strftime('%H:%M')}"
 
-    history_entry = History(
+    history_entry = await crud.add_history(
+        db,
+        item_ids=item_ids,
         username=current_user.username,
         buyer=wholesale_sale.buyer,
         extra_info=wholesale_sale.extra_info,
-        after_change=json.dumps(sale_items),
+        after_change=sale_items,
         history_type="opt",
         title=title,
         timestamp=shifted_datetime,
@@ -182,8 +292,7 @@ async def sell_wholesale(
         total_items_count=total_items_count,
         total_price=total_price
     )
-    db.add(history_entry)
-    db.commit()
+    await idempotency.store(db, history_entry)
 
     return history_entry
 
@@ -192,22 +301,14 @@ async def sell_wholesale(
 async def sell_retail(
         retail_sale: RetailSale,
         current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_unit_of_work),
+        idempotency: Idempotency = Depends(get_idempotency)
 ):
-    sale_items = []
-
-    # Проверка наличия всех товаров перед продажей
-    for item_data in retail_sale.items:
-        db_item = db.query(Item).filter(Item.name == item_data.name).first()
-        if not db_item:
-            raise HTTPException(status_code=404, detail=f"Item '{item_data.name}' not found")
+    replay = await idempotency.claim(db, current_user.username, retail_sale)
+    if replay is not None:
+        return replay
 
-        if db_item.quantity < item_data.quantity:
-            raise HTTPException(status_code=400, detail=f"Not enough '{item_data.name}' in stock")
-
-        db_item.quantity -= item_data.quantity
-
-        sale_items.append({"name": db_item.name, "quantity": item_data.quantity, "price": db_item.price})
+    sale_items, item_ids = await crud.sell_items(db, retail_sale.items)
 
     # Вычисление количества уникальных наименований, общего количества и общей цены продажи
     total_unique_items_count = len(set(item['name'] for item in sale_items))
@@ -220,11 +321,13 @@ async def sell_retail(
     title = f"{shifted_datetime.strftime('%d.%m.%Y')} | {current_user.username} | Розничная продажа | {shifted_datetime.strftime('%H:%M')}"
 
     # Создание записи в истории
-    history_entry = History(
+    history_entry = await crud.add_history(
+        db,
+        item_ids=item_ids,
         username=current_user.username,
         buyer=None,
         extra_info=retail_sale.extra_info,
-        after_change=json.dumps(sale_items),
+        after_change=sale_items,
         history_type="sale",
         title=title,
         timestamp=shifted_datetime,
@@ -232,13 +335,15 @@ async def sell_retail(
         total_items_count=total_items_count,
         total_price=total_price
     )
-    db.add(history_entry)
-    db.commit()
+    await idempotency.store(db, history_entry)
 
     return history_entry
 
 
 @router.get("/items_tg/", response_model=List[ItemOut])
-async def read_items(db: Session = Depends(get_db)):
-    items = db.query(Item).order_by(Item.name).all()
-    return items
+async def read_items(if_none_match: Optional[str] = Header(None), db: AsyncSession = Depends(get_async_db)):
+    snapshot = await catalog_cache.get(db)
+    headers = {ETAG_HEADER: snapshot.etag}
+    if etag_matches(if_none_match, snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
@@ -0,0 +1,64 @@
+import os
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from app.utils.catalog_cache import ETAG_HEADER, etag_matches
+from app.utils.jobs import job_runner
+from app.utils.pricelist import files_exist, pricelist_etag, pricelist_path, read_manifest, refresh_pricelists
+
+router = APIRouter(tags=['pricelist'])
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+RETRY_AFTER_SECONDS = 10
+OPEN_ATTEMPTS = 3
+CHUNK_SIZE = 64 * 1024
+
+
+def current_manifest():
+    manifest = read_manifest()
+    return manifest if manifest is not None and files_exist(manifest) else None
+
+
+# Файл открывается до ответа: если следующая пересборка его удалит, ответ дочитает его по открытому
+# дескриптору. Файл мог пропасть между чтением manifest и open - тогда читаем manifest заново.
+def open_pricelist(variant: str):
+    for _ in range(OPEN_ATTEMPTS):
+        manifest = current_manifest()
+        if manifest is None:
+            return None, None
+        try:
+            return manifest, open(pricelist_path(manifest, variant), "rb")
+        except FileNotFoundError:
+            continue
+    return None, None
+
+
+def read_chunks(file):
+    try:
+        while chunk := file.read(CHUNK_SIZE):
+            yield chunk
+    finally:
+        file.close()
+
+
+# Готовые файлы последней сборки; ETag меняется только вместе с содержимым прайс-листа
+@router.get("/pricelist/{variant}.xlsx")
+async def read_pricelist(variant: Literal["price", "price_default"], if_none_match: Optional[str] = Header(None)):
+    manifest, file = await run_in_threadpool(open_pricelist, variant)
+    if manifest is None:
+        job_runner.submit('refresh_pricelists', refresh_pricelists)
+        raise HTTPException(status_code=503, detail="Price list is being generated",
+                            headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+    etag = pricelist_etag(manifest, variant)
+    if etag_matches(if_none_match, etag):
+        file.close()
+        return Response(status_code=304, headers={ETAG_HEADER: etag})
+    return StreamingResponse(read_chunks(file), media_type=XLSX_MEDIA_TYPE, headers={
+        ETAG_HEADER: etag,
+        "Content-Length": str(os.fstat(file.fileno()).st_size),
+        "Content-Disposition": f'attachment; filename="{variant}.xlsx"',
+    })
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud
+from app.core.security.auth_cache import auth_cache
 from app.core.security.tokens import create_access_token
-from app.dependencies.database.database import get_db
+from app.dependencies.database.database import get_async_db
 from app.dependencies.get_current_user import get_current_user
 from app.models.history import History
 from app.models.item import Item
@@ -30,19 +31,24 @@ router = APIRouter(tags=['auth'])
 
 
 @router.post("/users/", response_model=User)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    return crud.create_user(db=db, user=user)
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    return await crud.create_user(db=db, user=user)
 
 
 @router.post("/login/")
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_username(db, username=user.username)
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    db_user = await crud.get_user_by_username(db, username=user.username)
     if not db_user or db_user.password != user.password:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
     token = create_access_token(data={"sub": user.username})
     return {"access_token": token, "token_type": "bearer"}
 
 
+@router.get("/auth/cache/")
+async def read_auth_cache_stats(current_user: User = Depends(get_current_user)):
+    return auth_cache.stats()
+
+
 @router.get("/me/")
 async def read_me(current_user: User = Depends(get_current_user)):
     return current_user
@@ -50,9 +56,9 @@ async def read_me(current_user: User = Depends(get_current_user)):
 
 @router.post("/change-password/")
 async def change_password(password_change: PasswordChange, current_user: User = Depends(get_current_user),
-                          db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_username(db, username=current_user.username)
+                          db: AsyncSession = Depends(get_async_db)):
+    db_user = await crud.get_user_by_username(db, username=current_user.username)
     if not db_user or db_user.password != password_change.old_password:
         raise HTTPException(status_code=400, detail="Incorrect password")
-    crud.change_password(db=db, user_id=db_user.id, new_password=password_change.new_password)
+    await crud.change_password(db=db, user_id=db_user.id, new_password=password_change.new_password)
     return {"message": "Password updated successfully"}
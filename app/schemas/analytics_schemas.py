@@ -0,0 +1,38 @@
+from datetime import date, datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class ItemSales(BaseModel):
+    item_id: Optional[int] = None
+    name: str
+    quantity: int
+    revenue: float
+    operations_count: int
+
+    class Config:
+        orm_mode = True
+
+
+class PeriodSales(BaseModel):
+    period: datetime
+    quantity: int
+    revenue: float
+    operations_count: int
+
+    class Config:
+        orm_mode = True
+
+
+class DailySales(BaseModel):
+    period: date
+    history_type: Optional[str] = None
+    username: Optional[str] = None
+    operations_count: int
+    unique_items_count: int
+    items_count: int
+    revenue: float
+
+    class Config:
+        orm_mode = True
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, Json
+from pydantic import BaseModel, Field
 from typing import Optional, Any, Union
 from datetime import datetime
 
@@ -7,8 +7,8 @@ class HistoryBase(BaseModel):
     username: str
     buyer: Optional[str] = None
     extra_info: Optional[str] = None
-    before_change: Optional[Json[Any]] = None
-    after_change: Json[Any]
+    before_change: Optional[Any] = None
+    after_change: Any
     history_type: str
     title: Optional[str] = None
     total_unique_items_count: Optional[int] = None
@@ -26,3 +26,19 @@ class History(HistoryBase):
 
     class Config:
         orm_mode = True
+
+
+# Строки архива - как они лежали в history, поэтому обязательных полей, кроме ключа, нет
+class HistoryArchive(BaseModel):
+    id: int
+    timestamp: datetime
+    username: Optional[str] = None
+    buyer: Optional[str] = None
+    extra_info: Optional[str] = None
+    before_change: Optional[Any] = None
+    after_change: Optional[Any] = None
+    history_type: Optional[str] = None
+    title: Optional[str] = None
+    total_unique_items_count: Optional[int] = None
+    total_items_count: Optional[int] = None
+    total_price: Optional[float] = None
@@ -0,0 +1,62 @@
+from sqlalchemy import exists
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.dependencies.database.database import SessionLocal
+from app.models.history import History
+from app.models.history_line import HistoryLine
+from app.models.item import Item
+
+BATCH_SIZE = 1000
+
+
+def _payload(value):
+    if not isinstance(value, list):
+        return []
+    return [item for item in value if isinstance(item, dict) and item.get("name")]
+
+
+def lines_from_history(entry: History):
+    after_change = _payload(entry.after_change)
+    if entry.history_type != "update":
+        return after_change
+
+    # Для изменения товара в строку пишем разницу остатка, как и update_item
+    before_change = _payload(entry.before_change)
+    lines = []
+    for index, item in enumerate(after_change):
+        previous = 0
+        if index < len(before_change):
+            previous = before_change[index].get("quantity") or 0
+        lines.append(dict(item, quantity=(item.get("quantity") or 0) - previous))
+    return lines
+
+
+# Заполняет history_lines для записей history, у которых строк ещё нет.
+# Повторный запуск безопасен: обработанные записи пропускаются.
+def backfill_history_lines(db: Session, batch_size: int = BATCH_SIZE):
+    item_ids = dict(db.query(Item.name, Item.id).all())
+    created = 0
+    last_id = 0
+    while True:
+        entries = (
+            db.query(History)
+            .filter(History.id > last_id, ~exists().where(HistoryLine.history_id == History.id))
+            .order_by(History.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not entries:
+            break
+        for entry in entries:
+            lines = crud.history_lines(entry, item_ids, lines_from_history(entry))
+            db.add_all(lines)
+            created += len(lines)
+        last_id = entries[-1].id
+        db.commit()
+    return created
+
+
+if __name__ == "__main__":
+    with SessionLocal() as db:
+        print(f"history_lines: added {backfill_history_lines(db)} lines")
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import threading
+
+from sqlalchemy import select
+
+from app.models.item import Item
+from app.utils.inventory_totals import INVENTORY_VERSION
+
+ETAG_HEADER = "ETag"
+
+
+def item_json(row) -> bytes:
+    # Тот же JSON, что отдаёт FastAPI для ItemOut
+    return json.dumps(
+        {"name": row.name, "quantity": row.quantity, "price": row.price, "id": row.id},
+        ensure_ascii=False, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def json_array(parts) -> bytes:
+    return b"[" + b",".join(parts) + b"]"
+
+
+class CatalogSnapshot:
+    # Все товары в порядке (name, id), как их сортирует Postgres, с уже сериализованными строками
+    def __init__(self, version: int, rows):
+        self.version = version
+        self.etag = f'"catalog-{version}"'
+        self.keys = [(row.name, row.id) for row in rows]
+        self.parts = [item_json(row) for row in rows]
+        self.positions = {row.id: index for index, row in enumerate(rows)}
+        self.body = json_array(self.parts)
+
+    def page(self, start: int, limit: int):
+        return self.keys[start:start + limit], json_array(self.parts[start:start + limit])
+
+    def position_after(self, name, item_id):
+        # Позиция следующего после курсора товара; None, если товара из курсора уже нет в снимке
+        index = self.positions.get(item_id)
+        if index is None or self.keys[index][0] != name:
+            return None
+        return index + 1
+
+
+class CatalogCache:
+    # Снимок каталога на процесс. Актуальность проверяется по сумме inventory_totals.version,
+    # которую триггер на items поднимает при каждом изменении, поэтому запись через любой
+    # воркер (или мимо приложения) сбрасывает снимки во всех процессах.
+    def __init__(self):
+        self.snapshot = None
+        self.lock = asyncio.Lock()
+        self.stats_lock = threading.Lock()
+        self.hits = 0
+        self.rebuilds = 0
+
+    async def get(self, db) -> CatalogSnapshot:
+        version = await db.scalar(INVENTORY_VERSION)
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.version == version:
+            self._count_hit()
+            return snapshot
+
+        async with self.lock:
+            snapshot = self.snapshot
+            if snapshot is not None and snapshot.version == version:
+                self._count_hit()
+                return snapshot
+            # Версия прочитана до товаров: снимок может оказаться новее своей версии,
+            # но не старше, и тогда просто пересоберётся на следующем запросе
+            rows = (await db.execute(
+                select(Item.id, Item.name, Item.quantity, Item.price).order_by(Item.name, Item.id)
+            )).all()
+            snapshot = CatalogSnapshot(version, rows)
+            # Без строки inventory_totals версии нет, такой снимок не кэшируем
+            if version is not None:
+                self.snapshot = snapshot
+            with self.stats_lock:
+                self.rebuilds += 1
+            return snapshot
+
+    def _count_hit(self):
+        with self.stats_lock:
+            self.hits += 1
+
+    def stats(self):
+        snapshot = self.snapshot
+        with self.stats_lock:
+            return {
+                "version": snapshot.version if snapshot else None,
+                "items": len(snapshot.keys) if snapshot else 0,
+                "bytes": len(snapshot.body) if snapshot else 0,
+                "hits": self.hits,
+                "rebuilds": self.rebuilds,
+            }
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+catalog_cache = CatalogCache()
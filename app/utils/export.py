@@ -0,0 +1,63 @@
+import csv
+import gzip
+import json
+from datetime import datetime
+
+from openpyxl import Workbook
+from pytz import utc
+from sqlalchemy import MetaData, Table, select
+from sqlalchemy.orm import Session
+
+EXPORT_SHEETS = [("History", "history"), ("Items", "items"), ("Users", "users")]
+CHUNK_SIZE = 2000
+
+
+def export_value(value):
+    if isinstance(value, datetime) and value.tzinfo:
+        # Как tz_localize(None) в прежней выгрузке через pandas: время в UTC без пояса
+        return value.astimezone(utc).replace(tzinfo=None)
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+# Строки таблицы через серверный курсор, в памяти не больше CHUNK_SIZE строк.
+# Колонки берём из БД, чтобы порядок совпадал с прежним pd.read_sql_table.
+def stream_table(db: Session, table_name: str):
+    table = Table(table_name, MetaData(), autoload_with=db.connection())
+    result = db.execute(select(table).execution_options(yield_per=CHUNK_SIZE))
+    yield [column.name for column in table.columns]
+    for row in result:
+        yield [export_value(value) for value in row]
+
+
+def export_xlsx(db: Session, path: str):
+    path = f"{path}.xlsx"
+    wb = Workbook(write_only=True)
+    for sheet_name, table_name in EXPORT_SHEETS:
+        ws = wb.create_sheet(sheet_name)
+        for row in stream_table(db, table_name):
+            ws.append(row)
+    wb.save(path)
+    return [path]
+
+
+def export_csv_gz(db: Session, path: str):
+    paths = []
+    for sheet_name, table_name in EXPORT_SHEETS:
+        sheet_path = f"{path}_{sheet_name.lower()}.csv.gz"
+        with gzip.open(sheet_path, "wt", encoding="utf-8", newline="") as file:
+            csv.writer(file).writerows(stream_table(db, table_name))
+        paths.append(sheet_path)
+    return paths
+
+
+EXPORTERS = {
+    "xlsx": export_xlsx,
+    "csv.gz": export_csv_gz,
+}
+
+
+# path без расширения; возвращает список файлов: один .xlsx или по .csv.gz на таблицу
+def export_database(db: Session, path: str, file_format: str = "xlsx"):
+    return EXPORTERS[file_format](db, path)
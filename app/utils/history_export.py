@@ -0,0 +1,86 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+
+from pytz import utc
+from sqlalchemy import select
+
+from app.dependencies.database.database import async_session_scope
+from app.models.history import History
+from app.utils.history_partitions import archive_value
+
+CHUNK_SIZE = 2000
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+GZIP_MEDIA_TYPE = "application/gzip"
+# wbits 16 + 15 - zlib пишет заголовок и CRC gzip, файл открывается обычным gunzip
+GZIP_WBITS = 31
+
+
+def export_query(date_from: Optional[date], date_to: Optional[date], history_type: Optional[List[str]]):
+    # Границы дней в UTC, как в аналитике; по timestamp отсекаются лишние партиции
+    query = select(History.__table__)
+    if date_from:
+        query = query.where(History.timestamp >= datetime.combine(date_from, time.min, utc))
+    if date_to:
+        query = query.where(History.timestamp < datetime.combine(date_to + timedelta(days=1), time.min, utc))
+    if history_type:
+        query = query.where(History.history_type.in_(history_type))
+    return query.order_by(History.timestamp, History.id)
+
+
+def export_file_name(date_from: Optional[date], date_to: Optional[date], file_format: str, compress: bool) -> str:
+    name = "_".join(["history", *(day.isoformat() for day in (date_from, date_to) if day)])
+    return f"{name}.{file_format}" + (".gz" if compress else "")
+
+
+def csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def ndjson_chunk(rows) -> str:
+    # Строки в том же виде, что и в архивах history_partitions
+    return "".join(json.dumps(dict(row._mapping), ensure_ascii=False, default=archive_value) + "\n" for row in rows)
+
+
+def csv_chunk(rows, header=None) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(header)
+    writer.writerows([csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+# Тело ответа: сессия открывается здесь, а не в зависимости - зависимости FastAPI закрываются
+# до отправки ответа. Строки идут серверным курсором порциями по CHUNK_SIZE, каждая порция
+# сразу уходит клиенту, так что память не растёт с размером диапазона.
+async def stream_history(query, file_format: str, compress: bool):
+    compressor = zlib.compressobj(wbits=GZIP_WBITS) if compress else None
+    header = [column.name for column in History.__table__.columns] if file_format == "csv" else None
+
+    async with async_session_scope() as db:
+        result = await db.stream(query.execution_options(yield_per=CHUNK_SIZE))
+        async for rows in result.partitions(CHUNK_SIZE):
+            if file_format == "csv":
+                chunk = csv_chunk(rows, header)
+                header = None
+            else:
+                chunk = ndjson_chunk(rows)
+            data = chunk.encode("utf-8")
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+
+    if header:
+        data = csv_chunk([], header).encode("utf-8")
+        yield compressor.compress(data) + compressor.flush() if compressor else data
+    elif compressor:
+        yield compressor.flush()
@@ -0,0 +1,228 @@
+import gzip
+import heapq
+import json
+import logging
+import os
+from datetime import date, datetime
+
+from pytz import utc
+from sqlalchemy import delete, desc, func, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import HISTORY_ARCHIVE_DIR, HISTORY_PARTITIONS_AHEAD, HISTORY_RETENTION_MONTHS
+from app.models.history import History
+from app.models.history_line import HistoryLine
+
+logger = logging.getLogger(__name__)
+
+PARTITION_FORMAT = "history_%Y_%m"
+DEFAULT_PARTITION = "history_default"
+ARCHIVE_SUFFIX = ".ndjson.gz"
+# Задачу ставит расписание каждого воркера, партициями занимается тот, кто взял блокировку
+ADVISORY_LOCK_KEY = 715001
+CHUNK_SIZE = 2000
+ARCHIVE_SEARCH_FIELDS = ("username", "buyer", "title", "extra_info", "history_type", "item_names")
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+# Границы месяца в UTC - так же считаются дни в аналитике
+def month_bounds(month: date):
+    start = datetime(month.year, month.month, 1, tzinfo=utc)
+    following = add_months(month, 1)
+    return start, datetime(following.year, following.month, 1, tzinfo=utc)
+
+
+def partition_name(month: date) -> str:
+    return month.strftime(PARTITION_FORMAT)
+
+
+def partition_months(db: Session):
+    names = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'history'::regclass"
+    )).scalars()
+    months = []
+    for name in names:
+        try:
+            months.append(datetime.strptime(name, PARTITION_FORMAT).date())
+        except ValueError:
+            continue
+    return sorted(months)
+
+
+def create_partition(db: Session, month: date) -> bool:
+    start, end = month_bounds(month)
+    # Партицию нельзя создать, пока строки её диапазона лежат в history_default
+    in_default = db.scalar(text(
+        f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE "timestamp" >= :start AND "timestamp" < :end)'
+    ), {"start": start, "end": end})
+    if in_default:
+        logger.warning("Rows for %s are in %s, partition is not created", month, DEFAULT_PARTITION)
+        return False
+    db.execute(text(
+        f"CREATE TABLE {partition_name(month)} PARTITION OF history "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+    logger.info("Created history partition %s", partition_name(month))
+    return True
+
+
+def ensure_partitions(db: Session, ahead: int, first_month: date = None):
+    existing = set(partition_months(db))
+    current = date.today().replace(day=1)
+    month = min(first_month or current, current)
+    while month <= add_months(current, ahead):
+        if month not in existing:
+            create_partition(db, month)
+        month = add_months(month, 1)
+
+
+def archive_path(month: date) -> str:
+    return os.path.join(HISTORY_ARCHIVE_DIR, partition_name(month) + ARCHIVE_SUFFIX)
+
+
+def archive_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot archive {type(value).__name__}")
+
+
+def archive_key(entry):
+    timestamp = entry["timestamp"]
+    return datetime.fromisoformat(timestamp) if isinstance(timestamp, str) else timestamp, entry["id"]
+
+
+def read_archive_entries(path: str):
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            yield json.loads(line)
+
+
+# Месяц history в gzip NDJSON, в том же порядке, что отдаёт /history/. Если архив месяца уже
+# есть (строки за этот месяц позже попали в history_default), новые строки сливаются с ним;
+# строки, уже лежащие в архиве после прерванного прогона, второй раз не пишутся.
+# Файл пишется под временным именем и подменяется целиком.
+def archive_partition(db: Session, month: date) -> int:
+    os.makedirs(HISTORY_ARCHIVE_DIR, exist_ok=True)
+    start, end = month_bounds(month)
+    path = archive_path(month)
+    rows = db.execute(
+        select(History.__table__)
+        .where(History.timestamp >= start, History.timestamp < end)
+        .order_by(desc(History.timestamp), desc(History.id))
+        .execution_options(yield_per=CHUNK_SIZE)
+    )
+    entries = (dict(row._mapping) for row in rows)
+    if os.path.exists(path):
+        entries = heapq.merge(entries, read_archive_entries(path), key=archive_key, reverse=True)
+    count = 0
+    previous = None
+    with gzip.open(path + ".tmp", "wt", encoding="utf-8") as file:
+        for entry in entries:
+            key = archive_key(entry)
+            if key == previous:
+                continue
+            previous = key
+            file.write(json.dumps(entry, ensure_ascii=False, default=archive_value))
+            file.write("\n")
+            count += 1
+    os.replace(path + ".tmp", path)
+    return count
+
+
+def delete_history_lines(db: Session, start: datetime, end: datetime):
+    db.execute(
+        delete(HistoryLine).where(HistoryLine.timestamp >= start, HistoryLine.timestamp < end),
+        execution_options={"synchronize_session": False},
+    )
+
+
+# Месяцы, строки которых лежат в history_default: их партиция не была создана вовремя
+def default_months(db: Session, before: date):
+    start, _ = month_bounds(before)
+    months = db.execute(text(
+        f"SELECT DISTINCT date_trunc('month', \"timestamp\" AT TIME ZONE 'UTC') FROM {DEFAULT_PARTITION} "
+        f"WHERE \"timestamp\" < :start"
+    ), {"start": start}).scalars()
+    return sorted(month.date() for month in months)
+
+
+# Месяцы старше months полных месяцев: архив, удаление их history_lines
+# (внешний ключ не даёт отсоединить партицию, на которую они ссылаются), DETACH и DROP.
+# Старые строки из history_default архивируются так же и удаляются из неё построчно.
+def apply_retention(db: Session, months: int):
+    cutoff = add_months(date.today().replace(day=1), -months)
+    for month in partition_months(db):
+        if month >= cutoff:
+            break
+        start, end = month_bounds(month)
+        rows = archive_partition(db, month)
+        delete_history_lines(db, start, end)
+        db.execute(text(f"ALTER TABLE history DETACH PARTITION {partition_name(month)}"))
+        db.execute(text(f"DROP TABLE {partition_name(month)}"))
+        logger.info("Archived %s history rows of %s to %s", rows, month, archive_path(month))
+
+    for month in default_months(db, cutoff):
+        start, end = month_bounds(month)
+        rows = archive_partition(db, month)
+        delete_history_lines(db, start, end)
+        db.execute(
+            delete(History).where(History.timestamp >= start, History.timestamp < end),
+            execution_options={"synchronize_session": False},
+        )
+        logger.info("Archived %s history rows of %s from %s to %s", rows, month, DEFAULT_PARTITION,
+                    archive_path(month))
+
+
+def maintain_history_partitions(db: Session):
+    if not db.scalar(select(func.pg_try_advisory_xact_lock(ADVISORY_LOCK_KEY))):
+        logger.info("History partitions are maintained by another worker")
+        return
+    ensure_partitions(db, HISTORY_PARTITIONS_AHEAD)
+    if HISTORY_RETENTION_MONTHS > 0:
+        apply_retention(db, HISTORY_RETENTION_MONTHS)
+    db.commit()
+
+
+def list_archives():
+    if not os.path.isdir(HISTORY_ARCHIVE_DIR):
+        return []
+    archives = []
+    for file_name in os.listdir(HISTORY_ARCHIVE_DIR):
+        if not file_name.endswith(ARCHIVE_SUFFIX):
+            continue
+        try:
+            month = datetime.strptime(file_name[:-len(ARCHIVE_SUFFIX)], PARTITION_FORMAT).date()
+        except ValueError:
+            continue
+        archives.append({
+            "month": month.strftime("%Y-%m"),
+            "file": file_name,
+            "size": os.path.getsize(os.path.join(HISTORY_ARCHIVE_DIR, file_name)),
+        })
+    return sorted(archives, key=lambda archive: archive["month"], reverse=True)
+
+
+# Чтение архива потоком: фильтры как у /history/ и /history/search/, но без индексов
+def read_archive(month: date, skip: int, limit: int, history_type: str = None, query_string: str = None):
+    needle = query_string.lower() if query_string else None
+    entries = []
+    matched = 0
+    with gzip.open(archive_path(month), "rt", encoding="utf-8") as file:
+        for line in file:
+            entry = json.loads(line)
+            if history_type and entry.get("history_type") != history_type:
+                continue
+            if needle and not any(needle in (entry.get(field) or "").lower() for field in ARCHIVE_SEARCH_FIELDS):
+                continue
+            matched += 1
+            if matched <= skip:
+                continue
+            entries.append(entry)
+            if len(entries) >= limit:
+                break
+    return entries
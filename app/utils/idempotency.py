@@ -0,0 +1,112 @@
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from fastapi import Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, func, null, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import IDEMPOTENCY_KEY_TTL_HOURS
+from app.models.idempotency_key import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+SWEEP_BATCH_SIZE = 5000
+
+
+def request_hash(payload) -> str:
+    body = json.dumps(jsonable_encoder(payload), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class Idempotency:
+    # Ключ запроса: claim в начале обработчика, store в его конце - в одной транзакции с работой.
+    # Без заголовка оба вызова ничего не делают.
+    def __init__(self, key: Optional[str], endpoint: str):
+        self.key = key
+        self.endpoint = endpoint
+        self.username = None
+        self.claimed = False
+
+    def where(self):
+        return (IdempotencyKey.key == self.key, IdempotencyKey.username == self.username,
+                IdempotencyKey.endpoint == self.endpoint)
+
+    # None - ключ наш, запрос выполняется; иначе сохранённый ответ первого запроса.
+    # Пока транзакция первого запроса не завершена, INSERT повтора ждёт на первичном ключе.
+    async def claim(self, db: AsyncSession, username: str, payload):
+        if self.key is None:
+            return None
+        self.username = username
+        digest = request_hash(payload)
+        stmt = insert(IdempotencyKey).values(
+            key=self.key, username=username, endpoint=self.endpoint, request_hash=digest,
+            expires_at=func.now() + timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS),
+        )
+        # Истёкший, но ещё не удалённый ключ занимаем заново
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[IdempotencyKey.key, IdempotencyKey.username, IdempotencyKey.endpoint],
+            set_={"request_hash": stmt.excluded.request_hash, "status_code": null(), "response": null(),
+                  "created_at": func.now(), "expires_at": stmt.excluded.expires_at},
+            where=IdempotencyKey.expires_at <= func.now(),
+        ).returning(IdempotencyKey.key)
+        if (await db.execute(stmt)).first() is not None:
+            self.claimed = True
+            return None
+
+        stored = (await db.execute(
+            select(IdempotencyKey.request_hash, IdempotencyKey.status_code, IdempotencyKey.response)
+            .where(*self.where())
+        )).one()
+        if stored.request_hash != digest:
+            raise HTTPException(status_code=422,
+                                detail=f"{IDEMPOTENCY_KEY_HEADER} was already used with a different request")
+        if stored.status_code is None:
+            raise HTTPException(status_code=409, detail=f"Request with this {IDEMPOTENCY_KEY_HEADER} is in progress")
+        return JSONResponse(content=stored.response, status_code=stored.status_code,
+                            headers={REPLAYED_HEADER: "true"})
+
+    # Ответ пишется до фиксации запроса: откат работы откатывает и ключ
+    async def store(self, db: AsyncSession, result, status_code: int = 200):
+        if self.claimed:
+            await db.execute(
+                update(IdempotencyKey).where(*self.where())
+                .values(status_code=status_code, response=jsonable_encoder(result))
+            )
+        return result
+
+
+async def get_idempotency(request: Request,
+                          idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER)):
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"{IDEMPOTENCY_KEY_HEADER} must be 1-{MAX_KEY_LENGTH} characters")
+    # Ключ действует в пределах пользователя и шаблона пути
+    return Idempotency(idempotency_key, f"{request.method} {request.scope['route'].path}")
+
+
+def sweep_idempotency_keys(db: Session):
+    deleted = 0
+    while True:
+        batch = select(IdempotencyKey.key, IdempotencyKey.username, IdempotencyKey.endpoint) \
+            .where(IdempotencyKey.expires_at <= func.now()).limit(SWEEP_BATCH_SIZE)
+        result = db.execute(
+            delete(IdempotencyKey).where(
+                tuple_(IdempotencyKey.key, IdempotencyKey.username, IdempotencyKey.endpoint).in_(batch)
+            ),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+        deleted += result.rowcount
+        if result.rowcount < SWEEP_BATCH_SIZE:
+            break
+    logger.info("Removed %s expired idempotency keys", deleted)
+    return deleted
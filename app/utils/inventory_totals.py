@@ -0,0 +1,60 @@
+import logging
+
+from sqlalchemy import BigInteger, cast, func, select
+from sqlalchemy.orm import Session
+
+from app.models.inventory_totals import TOTALS_STRIPES, InventoryTotals
+from app.models.item import Item
+
+logger = logging.getLogger(__name__)
+
+# total_price накапливается во float, мелкие расхождения округления дрейфом не считаем
+PRICE_TOLERANCE = 0.01
+TOTAL_COLUMNS = ("unique_items_count", "total_items_count", "total_price")
+
+# Суммы по строкам inventory_totals; без строк - NULL, тогда итоги считаются по items.
+# sum(bigint) в Postgres - numeric, приводим обратно к целым.
+STORED_TOTALS = select(
+    cast(func.sum(InventoryTotals.unique_items_count), BigInteger).label("unique_items_count"),
+    cast(func.sum(InventoryTotals.total_items_count), BigInteger).label("total_items_count"),
+    func.sum(InventoryTotals.total_price).label("total_price"),
+)
+INVENTORY_VERSION = select(cast(func.sum(InventoryTotals.version), BigInteger))
+
+
+def compute_inventory_totals(db: Session):
+    row = db.execute(select(
+        func.count(Item.id),
+        func.coalesce(func.sum(Item.quantity), 0),
+        func.coalesce(func.sum(Item.price * Item.quantity), 0.0),
+    )).one()
+    return {"unique_items_count": row[0], "total_items_count": row[1], "total_price": float(row[2])}
+
+
+# Пересчитывает итоги по items и исправляет строки inventory_totals, если сумма разошлась.
+# Строки итогов блокируются до подсчёта (в порядке id): триггеры параллельных изменений ждут
+# этой блокировки и применят свои дельты уже поверх исправленных значений.
+def verify_inventory_totals(db: Session):
+    stripes = {stripe.id: stripe for stripe in db.scalars(
+        select(InventoryTotals).order_by(InventoryTotals.id).with_for_update()
+    )}
+    actual = compute_inventory_totals(db)
+
+    missing = [stripe for stripe in range(1, TOTALS_STRIPES + 1) if stripe not in stripes]
+    if missing:
+        logger.warning("inventory_totals rows %s are missing, recreating them", missing)
+        for stripe in missing:
+            stripes[stripe] = InventoryTotals(id=stripe, unique_items_count=0, total_items_count=0,
+                                              total_price=0, version=0)
+            db.add(stripes[stripe])
+
+    drift = {column: sum(getattr(stripe, column) for stripe in stripes.values()) - actual[column]
+             for column in TOTAL_COLUMNS}
+    if drift["unique_items_count"] or drift["total_items_count"] or abs(drift["total_price"]) > PRICE_TOLERANCE:
+        logger.warning("inventory_totals drifted by %s, repairing", drift)
+    # Исправленные итоги целиком в строке id = 1, версии строк не трогаем
+    if any(drift.values()):
+        for stripe in stripes.values():
+            for column in TOTAL_COLUMNS:
+                setattr(stripe, column, actual[column] if stripe.id == 1 else 0)
+    db.commit()
@@ -0,0 +1,71 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app.core.config import JOB_WORKERS
+from app.dependencies.database.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class JobRunner:
+    # Выполняет задачи расписания в ограниченном пуле потоков, каждую со своей сессией БД.
+    # Если предыдущий запуск задачи ещё идёт, новый пропускается, а не ставится в очередь.
+    def __init__(self, max_workers: int):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def submit(self, name: str, job):
+        with self.lock:
+            stats = self.stats.setdefault(name, {
+                "running": False,
+                "runs": 0,
+                "failures": 0,
+                "skipped": 0,
+                "last_started": None,
+                "last_duration": None,
+                "last_status": None,
+                "last_error": None,
+            })
+            if stats["running"]:
+                stats["skipped"] += 1
+                logger.warning("Job %s is still running, skipping this run", name)
+                return None
+            stats["running"] = True
+        return self.executor.submit(self._run, name, job)
+
+    def _run(self, name: str, job):
+        started_at = datetime.now()
+        started = time.perf_counter()
+        status, error = "success", None
+        try:
+            with SessionLocal() as db:
+                job(db)
+        except Exception as e:
+            status, error = "failed", repr(e)
+            logger.exception("Job %s failed", name)
+        duration = time.perf_counter() - started
+
+        with self.lock:
+            stats = self.stats[name]
+            stats["running"] = False
+            stats["runs"] += 1
+            stats["failures"] += status == "failed"
+            stats["last_started"] = started_at.isoformat()
+            stats["last_duration"] = round(duration, 3)
+            stats["last_status"] = status
+            stats["last_error"] = error
+        logger.info("Job %s finished in %.1fs: %s", name, duration, status)
+
+    def snapshot(self):
+        with self.lock:
+            return {name: dict(stats) for name, stats in self.stats.items()}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+job_runner = JobRunner(JOB_WORKERS)
@@ -0,0 +1,226 @@
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+COMMIT_BUCKETS = (0, 1, 2, 3, 5, 10)
+# Путь без совпавшего маршрута не пишем в метку, иначе число рядов растёт от каждого 404
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestStats:
+    __slots__ = ("scope", "statements", "db_seconds", "commits")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.commits = 0
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return f"{self.scope['method']} {getattr(route, 'path', UNMATCHED_ROUTE)}"
+
+
+# Статистика текущего запроса; доходит до обработчиков событий SQLAlchemy
+# и в greenlet asyncpg, и в threadpool через копию контекста
+request_stats: ContextVar = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f"{name}_bucket", {**labels, "le": format_value(bound)}, cumulative
+        yield f"{name}_bucket", {**labels, "le": "+Inf"}, self.count
+        yield f"{name}_sum", labels, self.sum
+        yield f"{name}_count", labels, self.count
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = {}
+        self.statements = {}
+        self.db_seconds = {}
+        self.commits = {}
+        self.background_statements = 0
+        self.background_db_seconds = 0.0
+        self.background_commits = 0
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        with self.lock:
+            key = (method, route, str(status))
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+            self.latency[key].observe(seconds)
+
+            key = (method, route)
+            if key not in self.statements:
+                self.statements[key] = Histogram(STATEMENT_BUCKETS)
+            self.statements[key].observe(stats.statements)
+            self.db_seconds[key] = self.db_seconds.get(key, 0.0) + stats.db_seconds
+            if key not in self.commits:
+                self.commits[key] = Histogram(COMMIT_BUCKETS)
+            self.commits[key].observe(stats.commits)
+
+    def observe_background(self, seconds: float):
+        with self.lock:
+            self.background_statements += 1
+            self.background_db_seconds += seconds
+
+    def observe_background_commit(self):
+        with self.lock:
+            self.background_commits += 1
+
+    def families(self):
+        with self.lock:
+            latency = [
+                sample
+                for (method, route, status), histogram in sorted(self.latency.items())
+                for sample in histogram.samples(
+                    "http_request_duration_seconds", {"method": method, "route": route, "status": status}
+                )
+            ]
+            statements = [
+                sample
+                for (method, route), histogram in sorted(self.statements.items())
+                for sample in histogram.samples("http_request_sql_statements", {"method": method, "route": route})
+            ]
+            db_seconds = [
+                ("http_request_db_seconds_total", {"method": method, "route": route}, seconds)
+                for (method, route), seconds in sorted(self.db_seconds.items())
+            ]
+            commits = [
+                sample
+                for (method, route), histogram in sorted(self.commits.items())
+                for sample in histogram.samples("http_request_db_commits", {"method": method, "route": route})
+            ]
+            background_statements = [("db_background_statements_total", {}, self.background_statements)]
+            background_db_seconds = [("db_background_seconds_total", {}, self.background_db_seconds)]
+            background_commits = [("db_background_commits_total", {}, self.background_commits)]
+        return [
+            ("http_request_duration_seconds", "histogram", "Request latency by route and status", latency),
+            ("http_request_sql_statements", "histogram", "SQL statements issued per request", statements),
+            ("http_request_db_seconds_total", "counter", "Time spent in SQL statements by route", db_seconds),
+            ("http_request_db_commits", "histogram", "Transactions committed per request", commits),
+            ("db_background_statements_total", "counter", "SQL statements outside requests (scheduled jobs)",
+             background_statements),
+            ("db_background_seconds_total", "counter", "Time spent in SQL statements outside requests",
+             background_db_seconds),
+            ("db_background_commits_total", "counter", "Transactions committed outside requests", background_commits),
+        ]
+
+
+metrics = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    # Чистый ASGI: не буферизует ответ, так что у потоковых ответов время считается до последнего байта
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = request_stats.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_stats.reset(token)
+            # FastAPI записывает совпавший маршрут в scope, метка - шаблон пути, а не сам путь
+            route = scope.get("route")
+            metrics.observe_request(
+                scope["method"], getattr(route, "path", UNMATCHED_ROUTE), status,
+                time.perf_counter() - started, stats,
+            )
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_started"].pop()
+        stats = request_stats.get()
+        if stats is None:
+            metrics.observe_background(seconds)
+        else:
+            stats.statements += 1
+            stats.db_seconds += seconds
+
+    # COMMIT на уровне соединения: пустые транзакции сессии без соединения сюда не попадают
+    @event.listens_for(engine, "commit")
+    def _commit(conn):
+        stats = request_stats.get()
+        if stats is None:
+            metrics.observe_background_commit()
+        else:
+            stats.commits += 1
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        # after_cursor_execute после ошибки не вызывается, время начала снимаем здесь
+        connection = exception_context.connection
+        if connection is not None and exception_context.cursor is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+
+def format_value(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# families: [(name, type, help, [(sample_name, labels, value)])]
+def render_prometheus(families) -> str:
+    lines = []
+    for name, metric_type, help_text, samples in families:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for sample_name, labels, value in samples:
+            if value is None:
+                continue
+            label_text = ",".join(f'{key}="{escape_label(label)}"' for key, label in labels.items())
+            lines.append(f"{sample_name}{{{label_text}}} {format_value(value)}" if label_text
+                         else f"{sample_name} {format_value(value)}")
+    return "\n".join(lines) + "\n"
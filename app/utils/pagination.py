@@ -0,0 +1,60 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_ESTIMATE_HEADER = "X-Total-Estimate"
+MIN_INTEGER = -2 ** 31
+MAX_INTEGER = 2 ** 31 - 1
+
+
+def encode_cursor(*values):
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def cursor_value(value, kind):
+    # datetime приходит строкой isoformat, id - целым в пределах integer колонки
+    if kind is datetime:
+        if not isinstance(value, str):
+            raise ValueError("timestamp must be a string")
+        return datetime.fromisoformat(value)
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise ValueError(f"expected {kind.__name__}")
+    if kind is int and not MIN_INTEGER <= value <= MAX_INTEGER:
+        raise ValueError("id is out of range")
+    return value
+
+
+# kinds - типы значений курсора по порядку: str, int или datetime
+def decode_cursor(cursor: str, *kinds):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(kinds):
+            raise ValueError("wrong cursor size")
+        return [cursor_value(value, kind) for value, kind in zip(values, kinds)]
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+# Оценка числа строк по плану запроса - без COUNT(*) по всей таблице
+async def estimate_count(db, query):
+    plan = await db.scalar(Explain(query))
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
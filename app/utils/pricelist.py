@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+from pytz import utc
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import PRICELIST_DIR
+from app.models.item import Item
+from app.utils.inventory_totals import INVENTORY_VERSION
+from app.utils.send_excel import PRICE_COLUMNS, PRICE_DEFAULT_COLUMNS, write_pricelists
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = {
+    "price": PRICE_COLUMNS,
+    "price_default": PRICE_DEFAULT_COLUMNS,
+}
+MANIFEST_FILE = "manifest.json"
+TELEGRAM_FILE = "telegram_sent.json"
+# Задачу ставит расписание каждого воркера, файлы пишет тот, кто взял блокировку
+ADVISORY_LOCK_KEY = 715003
+
+
+def read_json(name: str):
+    try:
+        with open(os.path.join(PRICELIST_DIR, name), encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_json(name: str, data):
+    path = os.path.join(PRICELIST_DIR, name)
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def read_manifest():
+    return read_json(MANIFEST_FILE)
+
+
+def pricelist_path(manifest, variant: str) -> str:
+    return os.path.join(PRICELIST_DIR, manifest["files"][variant])
+
+
+def pricelist_etag(manifest, variant: str) -> str:
+    return f'"{variant}-{manifest["hash"][:16]}"'
+
+
+def files_exist(manifest) -> bool:
+    return all(
+        variant in manifest.get("files", {}) and os.path.exists(pricelist_path(manifest, variant))
+        for variant in VARIANTS
+    )
+
+
+def content_hash(items) -> str:
+    body = json.dumps(items, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def remove_stale_files(keep):
+    for file_name in os.listdir(PRICELIST_DIR):
+        if file_name.endswith(".xlsx") and file_name not in keep:
+            os.remove(os.path.join(PRICELIST_DIR, file_name))
+
+
+# Пересобирает прайс-листы, только если товары изменились: сначала сравнивается
+# версия каталога (сумма inventory_totals.version), затем хэш содержимого. Файлы с хэшем в имени пишутся под
+# временным именем и подменяются целиком, manifest.json - последним. Файлы предыдущей
+# сборки остаются, пока их может дочитывать уже начатый ответ.
+def refresh_pricelists(db: Session, force: bool = False):
+    try:
+        manifest = read_manifest()
+        if not db.scalar(select(func.pg_try_advisory_xact_lock(ADVISORY_LOCK_KEY))):
+            logger.info("Price lists are refreshed by another worker")
+            return manifest
+
+        version = db.scalar(INVENTORY_VERSION)
+        fresh = manifest is not None and files_exist(manifest)
+        if fresh and not force and version is not None and manifest["version"] == version:
+            return manifest
+
+        items = [
+            {"name": row.name, "price": row.price, "quantity": row.quantity}
+            for row in db.execute(select(Item.name, Item.price, Item.quantity).order_by(Item.name))
+        ]
+        digest = content_hash(items)
+        os.makedirs(PRICELIST_DIR, exist_ok=True)
+        if fresh and not force and manifest["hash"] == digest:
+            manifest["version"] = version
+            write_json(MANIFEST_FILE, manifest)
+            return manifest
+
+        files = {variant: f"{variant}-{digest[:16]}.xlsx" for variant in VARIANTS}
+        paths = [os.path.join(PRICELIST_DIR, files[variant]) for variant in VARIANTS]
+        # Обе раскладки за один проход по товарам
+        write_pricelists(items, {path + ".tmp": columns for path, columns in zip(paths, VARIANTS.values())})
+        for path in paths:
+            os.replace(path + ".tmp", path)
+        previous = manifest
+        manifest = {
+            "version": version,
+            "hash": digest,
+            "items": len(items),
+            "generated_at": datetime.now(utc).isoformat(),
+            "files": files,
+        }
+        write_json(MANIFEST_FILE, manifest)
+        remove_stale_files(set(files.values()) | set((previous or {}).get("files", {}).values()))
+        logger.info("Price lists regenerated for %s items, hash %s", len(items), digest[:16])
+        return manifest
+    finally:
+        # Снимает advisory-блокировку, писать в этой транзакции нечего
+        db.rollback()
+
+
+def last_sent_hash():
+    sent = read_json(TELEGRAM_FILE)
+    return sent["hash"] if sent else None
+
+
+def mark_sent(manifest):
+    write_json(TELEGRAM_FILE, {"hash": manifest["hash"], "sent_at": datetime.now(utc).isoformat()})
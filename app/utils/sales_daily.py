@@ -0,0 +1,102 @@
+from datetime import date, datetime, time, timedelta
+
+from pytz import utc
+from sqlalchemy import delete, func, literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import SALES_DAILY_CATCH_UP_DAYS
+from app.dependencies.database.database import SessionLocal
+from app.models.history import History
+from app.models.sales_daily import SalesDaily
+from app.utils.history_partitions import partition_months
+
+TOTAL_COLUMNS = ("operations_count", "unique_items_count", "items_count", "revenue")
+# SHARE ROW EXCLUSIVE конфликтует с ROW EXCLUSIVE, который берёт INSERT ... ON CONFLICT в rollup_upsert,
+# и сам с собой: пересборка ждёт, пока закоммитятся продажи, уже обновившие итоги, а новые продажи
+# ждут конца пересборки и прибавляются к пересчитанным строкам. Две пересборки тоже не пересекаются.
+LOCK_SALES_DAILY = "LOCK TABLE sales_daily IN SHARE ROW EXCLUSIVE MODE"
+
+
+def history_day(timestamp: datetime) -> date:
+    # timestamp в history уже со сдвигом +5 часов, день считаем в UTC, как и аналитика
+    return timestamp.astimezone(utc).date()
+
+
+# INSERT ... ON CONFLICT, прибавляющий записи history к её дню; sign=-1 вычитает её
+def rollup_upsert(history_entry: History, sign: int = 1):
+    stmt = insert(SalesDaily).values(
+        day=history_day(history_entry.timestamp),
+        history_type=history_entry.history_type or "",
+        username=history_entry.username or "",
+        operations_count=sign,
+        unique_items_count=sign * (history_entry.total_unique_items_count or 0),
+        items_count=sign * (history_entry.total_items_count or 0),
+        revenue=sign * (history_entry.total_price or 0),
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[SalesDaily.day, SalesDaily.history_type, SalesDaily.username],
+        set_={column: getattr(SalesDaily, column) + getattr(stmt.excluded, column) for column in TOTAL_COLUMNS},
+    )
+
+
+# Первый день, за который history ещё хранит записи: первая месячная партиция или более ранние
+# строки в history_default. Месяцы, удалённые политикой хранения, раньше этого дня.
+def history_start(db: Session):
+    days = [month for month in partition_months(db)[:1]]
+    first = db.scalar(select(func.min(History.timestamp)))
+    if first is not None:
+        days.append(history_day(first))
+    return min(days) if days else None
+
+
+# Пересчитывает дни [date_from, date_to] из history одним INSERT ... SELECT. Без date_from - с первого
+# дня, который есть в history: итоги архивных месяцев пересобрать не из чего, они не удаляются.
+# Записи history на время пересборки ждут блокировки sales_daily, поэтому полная пересборка - вне часов работы.
+def rebuild_sales_daily(db: Session, date_from: date = None, date_to: date = None):
+    db.execute(text(LOCK_SALES_DAILY))
+
+    if date_from is None:
+        date_from = history_start(db)
+        if date_from is None:
+            db.commit()
+            return 0
+
+    day = func.date(func.timezone("UTC", History.timestamp))
+    history_type = func.coalesce(History.history_type, literal_column("''"))
+    username = func.coalesce(History.username, literal_column("''"))
+    query = select(
+        day,
+        history_type,
+        username,
+        func.count(),
+        func.coalesce(func.sum(History.total_unique_items_count), 0),
+        func.coalesce(func.sum(History.total_items_count), 0),
+        func.coalesce(func.sum(History.total_price), 0),
+    )
+    stale = delete(SalesDaily)
+    if date_from:
+        query = query.where(History.timestamp >= datetime.combine(date_from, time.min, utc))
+        stale = stale.where(SalesDaily.day >= date_from)
+    if date_to:
+        query = query.where(History.timestamp < datetime.combine(date_to + timedelta(days=1), time.min, utc))
+        stale = stale.where(SalesDaily.day <= date_to)
+    query = query.group_by(day, history_type, username)
+
+    db.execute(stale)
+    # Под блокировкой таблицы DELETE и INSERT ... SELECT видят все продажи, уже попавшие в итоги
+    stmt = insert(SalesDaily).from_select(["day", "history_type", "username", *TOTAL_COLUMNS], query)
+    result = db.execute(stmt)
+    db.commit()
+    return result.rowcount
+
+
+def catch_up_sales_daily(db: Session):
+    # Сдвинутый timestamp сегодняшних записей может попасть уже на завтрашний UTC-день
+    today = datetime.now(utc).date()
+    rebuild_sales_daily(db, today - timedelta(days=SALES_DAILY_CATCH_UP_DAYS), today + timedelta(days=1))
+
+
+if __name__ == "__main__":
+    with SessionLocal() as db:
+        print(f"sales_daily: rebuilt {rebuild_sales_daily(db)} rows")
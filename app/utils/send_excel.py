@@ -1,7 +1,15 @@
+from copy import copy
+from typing import Callable, NamedTuple
+
 import requests
-from openpyxl.styles import Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Border, NamedStyle, Side
+from openpyxl.utils import get_column_letter
 from openpyxl.workbook import Workbook
 
+CELL_STYLE = "pricelist_cell"
+LOW_STOCK = 10
+
 
 def fetch_data(url):
     response = requests.get(url)
@@ -12,70 +20,89 @@ def fetch_data(url):
         return None
 
 
-def write_to_excel(data):
-    wb = Workbook()
-    ws = wb.active
-    ws.append(["Наименование", "Цена"])
-
-    max_name_length = 0  # Для хранения максимальной длины значения в столбце "Наименование"
-
-    for item in data:
-        name = item["name"]
-        price = item["price"]
-        if item["quantity"] < 10:
-            name += f" ({item['quantity']})"
-
-        # Определение максимальной длины
-        max_name_length = max(max_name_length, len(name))
-
-        ws.append([name, price])
-
-    # Установка ширины столбца "Наименование"
-    ws.column_dimensions['A'].width = max_name_length
-
-    # Добавляем обводку таблицы
-    border = Border(left=Side(style='thin'),
-                    right=Side(style='thin'),
-                    top=Side(style='thin'),
-                    bottom=Side(style='thin'))
-
-    for row in ws.iter_rows():
-        for cell in row:
-            cell.border = border
-
-    wb.save("price.xlsx")
-    print("Data has been written to price.xlsx")
-
-
-def write_to_excel_default(data):
-    wb = Workbook()
-    ws = wb.active
-    ws.append(["Наименование", "Количество", "Цена"])
-
-    max_name_length = 0  # Для хранения максимальной длины значения в столбце "Наименование"
-
-    for item in data:
-        name = item["name"]
-        quantity = item["quantity"]
-        price = item["price"]
-        if quantity < 10:
-            name += f" ({quantity})"
-
-        max_name_length = max(max_name_length, len(name))
-
-        ws.append([name, quantity, price])
-
-    ws.column_dimensions['A'].width = max_name_length
-
-    # Добавляем обводку таблицы
-    border = Border(left=Side(style='thin'),
-                    right=Side(style='thin'),
-                    top=Side(style='thin'),
-                    bottom=Side(style='thin'))
-
-    for row in ws.iter_rows():
-        for cell in row:
-            cell.border = border
-
-    wb.save("price_default.xlsx")
-    print("Data has been written to price_default.xlsx")
+class ColumnSpec(NamedTuple):
+    title: str
+    value: Callable
+    # Ширина по самому длинному значению колонки, как у "Наименование" в прежних файлах
+    fit_width: bool = False
+
+
+def display_name(item):
+    # Остаток меньше LOW_STOCK дописывается к названию
+    if item["quantity"] < LOW_STOCK:
+        return f"{item['name']} ({item['quantity']})"
+    return item["name"]
+
+
+PRICE_COLUMNS = [
+    ColumnSpec("Наименование", display_name, fit_width=True),
+    ColumnSpec("Цена", lambda item: item["price"]),
+]
+
+PRICE_DEFAULT_COLUMNS = [
+    ColumnSpec("Наименование", display_name, fit_width=True),
+    ColumnSpec("Количество", lambda item: item["quantity"]),
+    ColumnSpec("Цена", lambda item: item["price"]),
+]
+
+
+def cell_style():
+    side = Side(style="thin")
+    return NamedStyle(name=CELL_STYLE, border=Border(left=side, right=side, top=side, bottom=side))
+
+
+class PriceSheet:
+    # Лист write-only книги: строки уходят в файл сразу, у всех ячеек один общий именованный стиль
+    def __init__(self, path: str, columns, widths):
+        self.path = path
+        self.columns = columns
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet()
+        style = cell_style()
+        self.wb.add_named_style(style)
+        # То же, что cell.style = CELL_STYLE, без поиска стиля по имени на каждую ячейку
+        self.style = style.as_tuple()
+        # Ширины задаются до первой строки: write-only лист пишет колонки в начало файла
+        for index, column in enumerate(columns, start=1):
+            if column.fit_width and widths.get(column.title):
+                self.ws.column_dimensions[get_column_letter(index)].width = widths[column.title]
+        self.append([column.title for column in columns])
+
+    def append(self, values):
+        row = []
+        for value in values:
+            cell = WriteOnlyCell(self.ws, value)
+            cell._style = copy(self.style)
+            row.append(cell)
+        self.ws.append(row)
+
+    def save(self):
+        self.wb.save(self.path)
+
+
+# Книги для нескольких раскладок: targets - {путь: колонки}. Значение каждой колонки считается
+# один раз на товар (колонки с одинаковым заголовком - одна колонка) и используется и для ширины,
+# и для строк всех раскладок. Write-only лист требует ширины до первой строки, поэтому значения
+# сначала собираются целиком, а затем пишутся.
+def write_pricelists(data, targets):
+    specs = {column.title: column for columns in targets.values() for column in columns}
+    rows = [{title: spec.value(item) for title, spec in specs.items()} for item in data]
+    widths = {
+        title: max((len(str(values[title])) for values in rows), default=0)
+        for title, spec in specs.items() if spec.fit_width
+    }
+    sheets = [PriceSheet(path, columns, widths) for path, columns in targets.items()]
+    for values in rows:
+        for sheet in sheets:
+            sheet.append([values[column.title] for column in sheet.columns])
+    for sheet in sheets:
+        sheet.save()
+        print(f"Data has been written to {sheet.path}")
+
+
+def write_to_excel(data, path="price.xlsx"):
+    write_pricelists(data, {path: PRICE_COLUMNS})
+
+
+def write_to_excel_default(data, path="price_default.xlsx"):
+    write_pricelists(data, {path: PRICE_DEFAULT_COLUMNS})
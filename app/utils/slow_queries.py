@@ -0,0 +1,151 @@
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from pytz import utc
+from sqlalchemy import event
+
+from app.core.config import (
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE, SLOW_QUERY_LOG_BACKUPS, SLOW_QUERY_LOG_FILE, SLOW_QUERY_LOG_MAX_BYTES,
+    SLOW_QUERY_THRESHOLD_MS,
+)
+from app.utils.metrics import request_stats
+
+MAX_FINGERPRINTS = 500
+MAX_PARAMETERS_LENGTH = 2000
+EXPLAIN_SAVEPOINT = "slow_query_explain"
+
+LITERALS = re.compile(r"\$\d+|%\(\w+\)s|%s|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LIST = re.compile(r"\(\s*\?(?:::\w+)?(?:\s*,\s*\?(?:::\w+)?)+\s*\)")
+VALUES_ROWS = re.compile(r"(\([^()]*\))(?:\s*,\s*\([^()]*\))+")
+WHITESPACE = re.compile(r"\s+")
+
+
+# Текст запроса без значений: одинаковые запросы с разными параметрами и длиной IN/VALUES сходятся в один
+def fingerprint(statement: str):
+    normalized = LITERALS.sub("?", WHITESPACE.sub(" ", statement).strip())
+    normalized = VALUES_ROWS.sub(r"\1, ...", IN_LIST.sub("(...)", normalized))
+    return hashlib.md5(normalized.encode("utf-8")).hexdigest()[:16], normalized
+
+
+def log_parameters(statement: str, parameters):
+    # Пароли пользователей хранятся как есть, такие параметры в файл не пишем
+    if "password" in statement.lower():
+        return "<hidden>"
+    text = json.dumps(parameters, ensure_ascii=False, default=str)
+    return text if len(text) <= MAX_PARAMETERS_LENGTH else text[:MAX_PARAMETERS_LENGTH] + "..."
+
+
+# План на отдельном курсоре того же соединения, внутри SAVEPOINT, чтобы ошибка EXPLAIN
+# не оборвала транзакцию запроса. ANALYZE повторно выполняет запрос, поэтому только для SELECT.
+def explain(conn, statement: str, parameters):
+    options = "ANALYZE, BUFFERS" if statement.lstrip()[:6].upper() == "SELECT" else "COSTS"
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(f"SAVEPOINT {EXPLAIN_SAVEPOINT}")
+        try:
+            cursor.execute(f"EXPLAIN ({options}) {statement}", parameters)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        except Exception as e:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}")
+            plan = f"EXPLAIN failed: {e!r}"
+        cursor.execute(f"RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}")
+        return plan
+    except Exception as e:
+        return f"EXPLAIN skipped: {e!r}"
+    finally:
+        cursor.close()
+
+
+class SlowQueryLog:
+    # Пишет медленные запросы в ротируемый файл и копит по ним статистику по отпечаткам
+    def __init__(self, threshold_ms: float, sample_rate: float):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.lock = threading.Lock()
+        self.fingerprints = {}
+        self.logger = logging.getLogger("app.slow_queries")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+
+    def open(self, path: str, max_bytes: int, backups: int):
+        if not self.logger.handlers:
+            self.logger.addHandler(RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"))
+
+    def record(self, statement: str, parameters, duration_ms: float, route: str, plan):
+        key, normalized = fingerprint(statement)
+        now = datetime.now(utc).isoformat()
+        with self.lock:
+            entry = self.fingerprints.get(key)
+            if entry is None:
+                if len(self.fingerprints) >= MAX_FINGERPRINTS:
+                    # Вытесняем отпечаток с наименьшим суммарным временем
+                    del self.fingerprints[min(self.fingerprints, key=lambda k: self.fingerprints[k]["total_ms"])]
+                entry = self.fingerprints[key] = {
+                    "fingerprint": key, "statement": normalized, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "routes": {}, "last_seen": None, "last_plan": None,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["routes"][route] = entry["routes"].get(route, 0) + 1
+            entry["last_seen"] = now
+            if plan is not None:
+                entry["last_plan"] = plan
+
+        self.logger.info(json.dumps({
+            "time": now,
+            "duration_ms": round(duration_ms, 1),
+            "route": route,
+            "fingerprint": key,
+            "statement": statement,
+            "parameters": log_parameters(statement, parameters),
+            "plan": plan,
+        }, ensure_ascii=False))
+
+    def top(self, limit: int, order_by: str = "total_ms"):
+        with self.lock:
+            entries = [dict(entry, routes=dict(entry["routes"])) for entry in self.fingerprints.values()]
+        for entry in entries:
+            entry["avg_ms"] = round(entry["total_ms"] / entry["count"], 1)
+            entry["total_ms"] = round(entry["total_ms"], 1)
+            entry["max_ms"] = round(entry["max_ms"], 1)
+        return sorted(entries, key=lambda entry: entry[order_by], reverse=True)[:limit]
+
+    def reset(self):
+        with self.lock:
+            self.fingerprints.clear()
+
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_EXPLAIN_SAMPLE_RATE)
+
+
+def profile_engine(engine):
+    slow_query_log.open(SLOW_QUERY_LOG_FILE, SLOW_QUERY_LOG_MAX_BYTES, SLOW_QUERY_LOG_BACKUPS)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - conn.info["slow_query_started"].pop()) * 1000
+        if duration_ms < slow_query_log.threshold_ms:
+            return
+        plan = None
+        if not executemany and random.random() < slow_query_log.sample_rate:
+            plan = explain(conn, statement, parameters)
+        stats = request_stats.get()
+        slow_query_log.record(statement, parameters, duration_ms, stats.route if stats else "background", plan)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and exception_context.cursor is not None and connection.info.get("slow_query_started"):
+            connection.info["slow_query_started"].pop()
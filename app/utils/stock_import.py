@@ -0,0 +1,236 @@
+import csv
+import math
+import zipfile
+from datetime import datetime
+
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only
+
+IMPORT_TABLE = "stock_import"
+IMPORT_COLUMNS = ("line", "name", "quantity", "price")
+MAX_ERRORS = 50
+MAX_QUANTITY = 2 ** 31 - 1
+XLSX_SIGNATURE = b"PK\x03\x04"
+CSV_DELIMITERS = ",;\t"
+
+# Заголовки колонок в файле поставки: как в price_default.xlsx или по-английски
+HEADER_ALIASES = {
+    "name": {"name", "наименование", "название", "товар"},
+    "quantity": {"quantity", "количество", "кол-во", "кол."},
+    "price": {"price", "цена"},
+}
+
+
+class StockImportError(Exception):
+    def __init__(self, message: str, errors=None):
+        super().__init__(message)
+        self.message = message
+        self.errors = errors or []
+
+
+def detect_format(path: str) -> str:
+    with open(path, "rb") as file:
+        return "xlsx" if file.read(len(XLSX_SIGNATURE)) == XLSX_SIGNATURE else "csv"
+
+
+def read_csv_rows(path: str):
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        try:
+            dialect = csv.Sniffer().sniff(file.read(64 * 1024), delimiters=CSV_DELIMITERS)
+        except csv.Error:
+            dialect = csv.excel
+        file.seek(0)
+        yield from csv.reader(file, dialect)
+
+
+def read_xlsx_rows(path: str):
+    # read_only читает лист потоком, не загружая книгу целиком. Файл открываем сами:
+    # по пути openpyxl проверяет расширение, а загрузка сохраняется во временный файл без него
+    with open(path, "rb") as file:
+        wb = load_workbook(file, read_only=True, data_only=True)
+        try:
+            yield from wb.worksheets[0].iter_rows(values_only=True)
+        finally:
+            wb.close()
+
+
+def header_positions(row):
+    positions = {}
+    for index, title in enumerate(row):
+        title = str(title).strip().lower() if title is not None else ""
+        for column, aliases in HEADER_ALIASES.items():
+            if title in aliases and column not in positions:
+                positions[column] = index
+    missing = [column for column in HEADER_ALIASES if column not in positions]
+    if missing:
+        raise StockImportError(f"Header must contain columns: {', '.join(missing)}")
+    return positions
+
+
+def parse_number(value):
+    if isinstance(value, (int, float)):
+        return value
+    # Выгрузки из Excel: пробелы в разрядах и запятая вместо точки
+    return float(str(value).replace("\xa0", "").replace(" ", "").replace(",", "."))
+
+
+def parse_row(row, positions):
+    def cell(column):
+        index = positions[column]
+        return row[index] if index < len(row) else None
+
+    name = cell("name")
+    name = str(name).strip() if name is not None else ""
+    if not name:
+        raise ValueError("empty name")
+    try:
+        quantity = parse_number(cell("quantity"))
+    except (TypeError, ValueError):
+        raise ValueError("quantity is not a number")
+    if not float(quantity).is_integer():
+        raise ValueError("quantity must be a whole number")
+    if abs(quantity) > MAX_QUANTITY:
+        raise ValueError("quantity is too large")
+    try:
+        price = float(parse_number(cell("price")))
+    except (TypeError, ValueError):
+        raise ValueError("price is not a number")
+    if not math.isfinite(price):
+        raise ValueError("price is not a number")
+    return name, int(quantity), price
+
+
+def is_empty(row):
+    return all(value is None or str(value).strip() == "" for value in row)
+
+
+# Проверяет файл поставки и пишет строки в CSV для COPY; в памяти одна строка файла.
+# Ошибки копятся (до MAX_ERRORS), при любой ошибке не импортируется ничего.
+def prepare_import(source_path: str, target_path: str, file_format: str = None) -> int:
+    file_format = file_format or detect_format(source_path)
+    if file_format not in ("csv", "xlsx"):
+        raise StockImportError("Format must be csv or xlsx")
+    rows = read_xlsx_rows(source_path) if file_format == "xlsx" else read_csv_rows(source_path)
+
+    positions = None
+    errors = []
+    count = 0
+    try:
+        with open(target_path, "w", encoding="utf-8", newline="") as target:
+            writer = csv.writer(target)
+            for line, row in enumerate(rows, start=1):
+                if is_empty(row):
+                    continue
+                if positions is None:
+                    positions = header_positions(row)
+                    continue
+                try:
+                    name, quantity, price = parse_row(row, positions)
+                except ValueError as e:
+                    if len(errors) < MAX_ERRORS:
+                        errors.append({"line": line, "error": str(e)})
+                    continue
+                writer.writerow((line, name, quantity, price))
+                count += 1
+    except (csv.Error, UnicodeDecodeError, zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+        raise StockImportError(f"Cannot read {file_format} file: {e}")
+
+    if positions is None:
+        raise StockImportError("File is empty")
+    if errors:
+        raise StockImportError("File contains invalid rows", errors)
+    if not count:
+        raise StockImportError("File has no items")
+    return count
+
+
+def copy_import(db: Session, csv_path: str):
+    db.execute(text(
+        f"CREATE TEMP TABLE {IMPORT_TABLE} (line integer, name text, quantity integer, price double precision) "
+        "ON COMMIT DROP"
+    ))
+    connection = db.connection().connection
+    driver_connection = connection.driver_connection
+    if hasattr(driver_connection, "copy_to_table"):
+        # asyncpg: run_sync выполняется в greenlet сессии, корутину драйвера ждём через await_only
+        await_only(driver_connection.copy_to_table(
+            IMPORT_TABLE, source=csv_path, columns=list(IMPORT_COLUMNS), format="csv"
+        ))
+    else:
+        cursor = connection.cursor()
+        try:
+            with open(csv_path, encoding="utf-8") as file:
+                cursor.copy_expert(
+                    f"COPY {IMPORT_TABLE} ({', '.join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", file
+                )
+        finally:
+            cursor.close()
+    db.execute(text(f"ANALYZE {IMPORT_TABLE}"))
+
+
+# Итоги поставки в тех же величинах, что считает POST /items/ по списку позиций
+IMPORT_TOTALS = f"""
+SELECT count(DISTINCT name) AS unique_items_count, coalesce(sum(quantity), 0) AS items_count,
+       coalesce(sum(quantity * price), 0) AS total_price
+FROM {IMPORT_TABLE}
+"""
+
+# Как crud.upsert_items: повторы названия в файле складываются, цена - из последней строки.
+# Строки items блокируются в порядке name, как и при одновременных поставках.
+MERGE_ITEMS = f"""
+WITH merged AS (
+    SELECT name, sum(quantity) AS quantity, (array_agg(price ORDER BY line DESC))[1] AS price
+    FROM {IMPORT_TABLE}
+    GROUP BY name
+    ORDER BY name
+), upserted AS (
+    INSERT INTO items (name, quantity, price)
+    SELECT name, quantity, price FROM merged
+    ON CONFLICT (name) DO UPDATE SET quantity = items.quantity + excluded.quantity, price = excluded.price
+    RETURNING (xmax = 0) AS inserted
+)
+SELECT count(*) FILTER (WHERE inserted) AS created, count(*) FILTER (WHERE NOT inserted) AS updated
+FROM upserted
+"""
+
+# after_change и item_names собираются в Postgres, без передачи всех строк через приложение
+FILL_HISTORY = f"""
+UPDATE history SET
+    after_change = (
+        SELECT jsonb_agg(jsonb_build_object('name', name, 'quantity', quantity, 'price', price) ORDER BY line)
+        FROM {IMPORT_TABLE}
+    ),
+    item_names = (
+        SELECT string_agg(name, E'\\n' ORDER BY first_line)
+        FROM (SELECT name, min(line) AS first_line FROM {IMPORT_TABLE} GROUP BY name) names
+    )
+WHERE id = :history_id AND "timestamp" = :timestamp
+"""
+
+INSERT_LINES = f"""
+INSERT INTO history_lines (history_id, item_id, name, quantity, price, history_type, "timestamp")
+SELECT CAST(:history_id AS integer), i.id, s.name, s.quantity, s.price,
+       CAST(:history_type AS varchar), CAST(:timestamp AS timestamptz)
+FROM {IMPORT_TABLE} s
+LEFT JOIN items i ON i.name = s.name
+ORDER BY s.line
+"""
+
+
+def import_totals(db: Session):
+    return db.execute(text(IMPORT_TOTALS)).one()
+
+
+def merge_import(db: Session):
+    return db.execute(text(MERGE_ITEMS)).one()
+
+
+def fill_import_history(db: Session, history_id: int, history_type: str, timestamp: datetime) -> int:
+    db.execute(text(FILL_HISTORY), {"history_id": history_id, "timestamp": timestamp})
+    result = db.execute(text(INSERT_LINES), {
+        "history_id": history_id, "history_type": history_type, "timestamp": timestamp,
+    })
+    return result.rowcount
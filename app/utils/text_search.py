@@ -0,0 +1,16 @@
+LATIN_LAYOUT = "`qwertyuiop[]asdfghjkl;'zxcvbnm,."
+CYRILLIC_LAYOUT = "ёйцукенгшщзхъфывапролджэячсмитьбю"
+
+TO_CYRILLIC = str.maketrans(LATIN_LAYOUT + LATIN_LAYOUT.upper(), CYRILLIC_LAYOUT + CYRILLIC_LAYOUT.upper())
+TO_LATIN = str.maketrans(CYRILLIC_LAYOUT + CYRILLIC_LAYOUT.upper(), LATIN_LAYOUT + LATIN_LAYOUT.upper())
+
+
+def escape_like(value: str) -> str:
+    # Экранирование для LIKE/ILIKE с escape="\\"
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_variants(query: str):
+    # Запрос как есть, с ё -> е и набранный не в той раскладке (ЙЦУКЕН <-> QWERTY)
+    variants = [query, query.replace("ё", "е").replace("Ё", "Е"), query.translate(TO_CYRILLIC), query.translate(TO_LATIN)]
+    return list(dict.fromkeys(variant for variant in variants if variant))
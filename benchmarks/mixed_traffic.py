@@ -0,0 +1,165 @@
+"""Mixed add/sell/read/search load against a running API instance.
+
+    python -m benchmarks.seed --yes            # once, see benchmarks/seed.py
+    python benchmarks/mixed_traffic.py --url http://localhost:8001 \\
+        --username bench1 --password bench1 --concurrency 32 --duration 30 --workers 1 --json run.json
+
+Start the server once with DB_ASYNC=true and once with DB_ASYNC=false
+(same --workers) to compare requests per second per worker.
+
+Statements and commits per request come from the server's /metrics before
+and after the run; with several workers that is whichever worker answered /metrics.
+At the end the catalog is checked for negative stock.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from collections import defaultdict
+
+import httpx
+
+# (операция, вес, маршрут в /metrics)
+OPERATIONS = [
+    ("items", 35, ("GET", "/items/")),
+    ("history", 20, ("GET", "/history/")),
+    ("summary", 15, ("GET", "/items/summary/")),
+    ("search", 10, ("GET", "/items/search/")),
+    ("sell", 15, ("POST", "/sell/retail/")),
+    ("add", 5, ("POST", "/items/")),
+]
+METRIC_LINE = re.compile(
+    r'^http_request_(sql_statements|db_commits)_(sum|count)\{method="([^"]*)",route="([^"]*)"\} (\S+)$',
+    re.MULTILINE,
+)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def login(client, username, password):
+    response = await client.post("/login/", json={"username": username, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def metric_totals(client):
+    response = await client.get("/metrics")
+    if response.status_code != 200:
+        return {}
+    totals = defaultdict(float)
+    for family, kind, method, route, value in METRIC_LINE.findall(response.text):
+        totals[(family, kind, method, route)] = float(value)
+    return totals
+
+
+def per_request(before, after, family, route):
+    count = after.get((family, "count", *route), 0) - before.get((family, "count", *route), 0)
+    if not count:
+        return None
+    return (after.get((family, "sum", *route), 0) - before.get((family, "sum", *route), 0)) / count
+
+
+async def request(client, operation, headers, names):
+    if operation == "items":
+        return await client.get("/items/", params={"limit": 50}, headers=headers)
+    if operation == "history":
+        return await client.get("/history/", params={"limit": 20}, headers=headers)
+    if operation == "summary":
+        return await client.get("/items/summary/", headers=headers)
+    if operation == "search":
+        return await client.get("/items/search/", params={"name": random.choice(list(names))[:5]}, headers=headers)
+    if operation == "add":
+        name = random.choice(list(names))
+        return await client.post("/items/", headers=headers, json=[
+            {"name": name, "quantity": random.randint(1, 5), "price": names[name]},
+        ])
+    return await client.post("/sell/retail/", headers=headers, json={
+        "extra_info": "benchmark",
+        "items": [{"name": name, "quantity": 1} for name in random.sample(list(names), random.randint(1, 3))],
+    })
+
+
+async def worker(client, headers, names, deadline, latencies, errors):
+    population = [operation for operation, _, _ in OPERATIONS]
+    weights = [weight for _, weight, _ in OPERATIONS]
+    while time.perf_counter() < deadline:
+        operation = random.choices(population, weights)[0]
+        started = time.perf_counter()
+        try:
+            response = await request(client, operation, headers, names)
+            # 400 у продажи - нет остатка, это корректный ответ
+            if response.status_code >= 500 or (response.status_code >= 400 and operation != "sell"):
+                errors[operation] += 1
+        except httpx.HTTPError:
+            errors[operation] += 1
+        latencies[operation].append((time.perf_counter() - started) * 1000)
+
+
+async def main(args):
+    random.seed(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        headers = await login(client, args.username, args.password)
+        catalog = (await client.get("/items_tg/")).json()
+        names = {item["name"]: item["price"] for item in catalog if item["quantity"] > 0}
+        if not names:
+            raise SystemExit("No items in stock, seed the database first")
+
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        before = await metric_totals(client)
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            worker(client, headers, names, deadline, latencies, errors) for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+        after = await metric_totals(client)
+        negative = [item for item in (await client.get("/items_tg/")).json() if item["quantity"] < 0]
+
+    total = sum(len(values) for values in latencies.values())
+    report = {"elapsed_s": round(elapsed, 1), "requests": total, "rps": round(total / elapsed, 1),
+              "rps_per_worker": round(total / elapsed / args.workers, 1), "operations": {}}
+    print(f"{'operation':<10}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'stmt/req':>10}{'commit/req':>12}")
+    for operation, _, route in OPERATIONS:
+        values = latencies[operation]
+        statements = per_request(before, after, "sql_statements", route)
+        commits = per_request(before, after, "db_commits", route)
+        report["operations"][operation] = {
+            "requests": len(values), "errors": errors[operation],
+            "p50_ms": round(percentile(values, 0.5), 1), "p95_ms": round(percentile(values, 0.95), 1),
+            "p99_ms": round(percentile(values, 0.99), 1), "statements_per_request": statements,
+            "commits_per_request": commits,
+        }
+        print(f"{operation:<10}{len(values):>10}{errors[operation]:>8}"
+              f"{percentile(values, 0.5):>10.1f}{percentile(values, 0.95):>10.1f}{percentile(values, 0.99):>10.1f}"
+              f"{statements if statements is not None else float('nan'):>10.1f}"
+              f"{commits if commits is not None else float('nan'):>12.2f}")
+    print(f"\n{total} requests in {elapsed:.1f}s: {total / elapsed:.1f} req/s, "
+          f"{total / elapsed / args.workers:.1f} req/s per worker")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+    if negative:
+        raise SystemExit(f"Negative stock after the run: {negative[:10]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers serving --url")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for the traffic mix")
+    parser.add_argument("--json", help="also write the report to this file")
+    asyncio.run(main(parser.parse_args()))
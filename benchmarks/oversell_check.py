@@ -0,0 +1,87 @@
+"""Concurrent sells of a few low-stock items must never oversell.
+
+    python benchmarks/oversell_check.py --url http://localhost:8001 \\
+        --username bench1 --password bench1 --items 5 --stock 50 --concurrency 64 --sells 40
+
+Sets --items items to --stock units with PUT /items/{id}, then fires sells of
+1-3 units (sometimes several items per sale) from --concurrency clients. Afterwards
+every item must have stock >= 0 and exactly stock - sold units, where sold
+units are summed from successful responses. Run it alone: other writes to the
+same items break the accounting. Exits with status 1 on a violation.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+
+import httpx
+
+
+async def login(client, username, password):
+    response = await client.post("/login/", json={"username": username, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def seller(client, headers, names, sells, sold, outcomes):
+    for _ in range(sells):
+        lines = [{"name": name, "quantity": random.randint(1, 3)}
+                 for name in random.sample(names, random.choice((1, 1, 1, 2)))]
+        response = await client.post("/sell/retail/", headers=headers,
+                                     json={"extra_info": "oversell check", "items": lines})
+        outcomes[response.status_code] += 1
+        if response.status_code == 200:
+            for line in lines:
+                sold[line["name"]] += line["quantity"]
+
+
+async def main(args):
+    random.seed(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        headers = await login(client, args.username, args.password)
+        catalog = sorted((await client.get("/items_tg/")).json(), key=lambda item: item["name"])
+        hot = random.sample(catalog, args.items)
+        for item in hot:
+            response = await client.put(f"/items/{item['id']}", headers=headers, json={
+                "item_update": {"name": item["name"], "quantity": args.stock, "price": item["price"]},
+            })
+            response.raise_for_status()
+
+        names = [item["name"] for item in hot]
+        sold = Counter()
+        outcomes = Counter()
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            seller(client, headers, names, args.sells, sold, outcomes) for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+        final = {item["name"]: item["quantity"] for item in (await client.get("/items_tg/")).json()}
+
+    total = sum(outcomes.values())
+    print(f"{total} sells in {elapsed:.1f}s ({total / elapsed:.1f}/s), status codes: {dict(outcomes)}")
+    violations = []
+    for name in names:
+        expected = args.stock - sold[name]
+        print(f"{name}: sold {sold[name]}, left {final.get(name)}, expected {expected}")
+        if final.get(name) is None or final[name] < 0 or final[name] != expected:
+            violations.append(name)
+    if outcomes.get(500):
+        violations.append("server errors")
+    if violations:
+        raise SystemExit(f"FAILED: {', '.join(violations)}")
+    print("OK: no negative stock, every sold unit accounted for")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--items", type=int, default=5)
+    parser.add_argument("--stock", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--sells", type=int, default=40, help="sells per client")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(main(parser.parse_args()))
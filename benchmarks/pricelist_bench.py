@@ -0,0 +1,174 @@
+"""Price list generation: the write-only generator against the previous functions.
+
+    python -m benchmarks.pricelist_bench --items 50000 --repeat 3
+
+Both price lists (price + price_default) are built from the same synthetic,
+seeded catalog by the old code (copied below as it was before the
+write-only generator) and by app.utils.send_excel.write_pricelists.
+Time is the best of --repeat runs; peak memory is measured with tracemalloc
+in a separate run, so tracing does not distort the timings. Before timing,
+the files of both implementations are compared cell by cell (values,
+borders, name column width).
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from openpyxl import load_workbook
+from openpyxl.styles import Border, Side
+from openpyxl.workbook import Workbook
+
+from app.utils.send_excel import PRICE_COLUMNS, PRICE_DEFAULT_COLUMNS, write_pricelists
+
+
+def legacy_write_to_excel(data, path):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Наименование", "Цена"])
+
+    max_name_length = 0
+
+    for item in data:
+        name = item["name"]
+        price = item["price"]
+        if item["quantity"] < 10:
+            name += f" ({item['quantity']})"
+
+        max_name_length = max(max_name_length, len(name))
+
+        ws.append([name, price])
+
+    ws.column_dimensions['A'].width = max_name_length
+
+    border = Border(left=Side(style='thin'),
+                    right=Side(style='thin'),
+                    top=Side(style='thin'),
+                    bottom=Side(style='thin'))
+
+    for row in ws.iter_rows():
+        for cell in row:
+            cell.border = border
+
+    wb.save(path)
+
+
+def legacy_write_to_excel_default(data, path):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Наименование", "Количество", "Цена"])
+
+    max_name_length = 0
+
+    for item in data:
+        name = item["name"]
+        quantity = item["quantity"]
+        price = item["price"]
+        if quantity < 10:
+            name += f" ({quantity})"
+
+        max_name_length = max(max_name_length, len(name))
+
+        ws.append([name, quantity, price])
+
+    ws.column_dimensions['A'].width = max_name_length
+
+    border = Border(left=Side(style='thin'),
+                    right=Side(style='thin'),
+                    top=Side(style='thin'),
+                    bottom=Side(style='thin'))
+
+    for row in ws.iter_rows():
+        for cell in row:
+            cell.border = border
+
+    wb.save(path)
+
+
+def catalog(count, seed):
+    rng = random.Random(seed)
+    items = [
+        {"name": f"Товар {number:06d} {rng.choice(['белый', 'чёрный', 'XL', 'набор'])}",
+         "price": round(rng.uniform(10, 10000), 2),
+         "quantity": rng.randint(0, 500) if rng.random() > 0.1 else rng.randint(0, 9)}
+        for number in range(count)
+    ]
+    return sorted(items, key=lambda item: item["name"])
+
+
+def run_legacy(items, directory):
+    legacy_write_to_excel(items, os.path.join(directory, "legacy_price.xlsx"))
+    legacy_write_to_excel_default(items, os.path.join(directory, "legacy_price_default.xlsx"))
+
+
+def run_write_only(items, directory):
+    # write_pricelists печатает путь каждого файла, в замерах это не нужно
+    with contextlib.redirect_stdout(io.StringIO()):
+        write_pricelists(items, {
+            os.path.join(directory, "price.xlsx"): PRICE_COLUMNS,
+            os.path.join(directory, "price_default.xlsx"): PRICE_DEFAULT_COLUMNS,
+        })
+
+
+def sheet_contents(path):
+    # Не read_only: ширины колонок и стили доступны только в обычном режиме
+    ws = load_workbook(path).worksheets[0]
+    rows = [
+        tuple((cell.value, cell.border.left.style, cell.border.right.style, cell.border.top.style,
+               cell.border.bottom.style) for cell in row)
+        for row in ws.iter_rows()
+    ]
+    return rows, ws.column_dimensions["A"].width
+
+
+def check_same_output(items, directory):
+    run_legacy(items, directory)
+    run_write_only(items, directory)
+    for name in ("price.xlsx", "price_default.xlsx"):
+        if sheet_contents(os.path.join(directory, f"legacy_{name}")) != sheet_contents(os.path.join(directory, name)):
+            raise SystemExit(f"FAILED: {name} differs from the previous implementation")
+    print("Output check: cell values, borders and name column width match")
+
+
+def measure(function, items, directory, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(items, directory)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    function(items, directory)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak
+
+
+def main(args):
+    items = catalog(args.items, args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        if not args.skip_check:
+            check_same_output(items[:args.check_items], directory)
+        results = {name: measure(function, items, directory, args.repeat)
+                   for name, function in (("legacy", run_legacy), ("write-only", run_write_only))}
+
+    print(f"{args.items} items, both price lists, best of {args.repeat}")
+    print(f"{'implementation':<16}{'seconds':>10}{'peak MiB':>12}")
+    for name, (seconds, peak) in results.items():
+        print(f"{name:<16}{seconds:>10.2f}{peak / 1024 / 1024:>12.1f}")
+    (legacy_seconds, legacy_peak), (seconds, peak) = results["legacy"], results["write-only"]
+    print(f"speed-up {legacy_seconds / seconds:.1f}x, peak memory {legacy_peak / peak:.1f}x lower")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--check-items", type=int, default=2000, help="catalog size for the output check")
+    parser.add_argument("--skip-check", action="store_true")
+    main(parser.parse_args())
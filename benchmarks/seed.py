@@ -0,0 +1,126 @@
+"""Seed a local or disposable Postgres with benchmark volumes.
+
+    docker run -d --name azv-bench -p 5433:5432 -e POSTGRES_PASSWORD=bench -e POSTGRES_DB=azv_bench postgres:16
+    export POSTGRES_HOST=localhost POSTGRES_PORT=5433 POSTGRES_USER=postgres POSTGRES_PASSWORD=bench POSTGRES_DB=azv_bench
+    alembic upgrade head
+    python -m benchmarks.seed --items 50000 --history 5000000 --yes
+
+Rows are generated inside Postgres with generate_series and setseed(--seed),
+so the same arguments give the same data set. Creates users bench1..benchN
+(password = username, role admin) for the load scripts.
+"""
+import argparse
+import time
+from datetime import datetime
+
+from pytz import utc
+from sqlalchemy import text
+
+from app.core.config import HISTORY_PARTITIONS_AHEAD, POSTGRES_DB, POSTGRES_HOST, POSTGRES_PORT
+from app.dependencies.database.database import engine
+from app.utils.history_partitions import add_months, ensure_partitions
+from app.utils.sales_daily import rebuild_sales_daily
+
+ITEM_NAME = "'Товар ' || lpad(({number})::text, 6, '0')"
+
+SEED_ITEMS = f"""
+INSERT INTO items (name, quantity, price)
+SELECT {ITEM_NAME.format(number="g")}, 50 + floor(random() * 500)::int, round((10 + random() * 10000)::numeric, 2)::float
+FROM generate_series(1, :items) g
+ON CONFLICT (name) DO NOTHING
+"""
+
+SEED_USERS = """
+INSERT INTO users (username, password, role)
+SELECT 'bench' || g, 'bench' || g, 'admin' FROM generate_series(1, :users) g
+ON CONFLICT (username) DO NOTHING
+"""
+
+# Запись history с 1-3 позициями; распределение типов примерно как в рабочей базе
+SEED_HISTORY = f"""
+INSERT INTO history ("timestamp", username, buyer, extra_info, after_change, history_type, title,
+                     total_unique_items_count, total_items_count, total_price, item_names)
+SELECT h.ts, h.username, CASE WHEN h.kind = 'opt' THEN 'Покупатель ' || (h.g % 200) END, 'benchmark',
+       lines.after_change, h.kind,
+       to_char(h.ts, 'DD.MM.YYYY') || ' | ' || h.username || ' | ' || h.kind || ' | ' || to_char(h.ts, 'HH24\\:MI'),
+       lines.unique_count, lines.quantity, round(lines.price)::int, lines.names
+FROM (
+    SELECT g,
+           :history_from + random() * (:history_to - :history_from) AS ts,
+           (ARRAY['sale', 'sale', 'sale', 'sale', 'sale', 'opt', 'opt', 'add', 'add', 'update'])[1 + floor(random() * 10)::int] AS kind,
+           'bench' || (1 + floor(random() * :users)::int) AS username
+    FROM generate_series(:first, :last) g
+) h
+CROSS JOIN LATERAL (
+    SELECT jsonb_agg(jsonb_build_object('name', i.name, 'quantity', i.quantity, 'price', i.price)) AS after_change,
+           count(*) AS unique_count, sum(i.quantity) AS quantity, sum(i.quantity * i.price) AS price,
+           string_agg(i.name, E'\\n') AS names
+    FROM (
+        SELECT {ITEM_NAME.format(number="1 + floor(random() * :items)::int")} AS name,
+               1 + floor(random() * 5)::int AS quantity,
+               round((10 + random() * 10000)::numeric, 2)::float AS price
+        FROM generate_series(1, 1 + h.g % 3)
+    ) i
+) lines
+"""
+
+SEED_LINES = """
+INSERT INTO history_lines (history_id, item_id, name, quantity, price, history_type, "timestamp")
+SELECT h.id, i.id, e->>'name', (e->>'quantity')::int, (e->>'price')::float, h.history_type, h."timestamp"
+FROM history h
+CROSS JOIN LATERAL jsonb_array_elements(h.after_change) e
+LEFT JOIN items i ON i.name = e->>'name'
+WHERE h.id > :after_id AND h.id <= :last_id
+"""
+
+
+def seed(args):
+    history_to = datetime.now(utc)
+    first_month = add_months(history_to.date().replace(day=1), -args.months + 1)
+    history_from = datetime(first_month.year, first_month.month, 1, tzinfo=utc)
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT setseed(:seed)"), {"seed": args.seed})
+        if args.reset:
+            conn.execute(text("TRUNCATE history, history_lines, sales_daily, items RESTART IDENTITY CASCADE"))
+        conn.execute(text(SEED_USERS), {"users": args.users})
+        conn.execute(text(SEED_ITEMS), {"items": args.items})
+        ensure_partitions(conn, HISTORY_PARTITIONS_AHEAD, first_month)
+        conn.commit()
+        print(f"items: {args.items}, users: bench1..bench{args.users}")
+
+        started = time.perf_counter()
+        for first in range(1, args.history + 1, args.batch_size):
+            last = min(first + args.batch_size - 1, args.history)
+            after_id = conn.scalar(text("SELECT coalesce(max(id), 0) FROM history"))
+            conn.execute(text(SEED_HISTORY), {
+                "first": first, "last": last, "items": args.items, "users": args.users,
+                "history_from": history_from, "history_to": history_to,
+            })
+            if not args.no_lines:
+                last_id = conn.scalar(text("SELECT max(id) FROM history"))
+                conn.execute(text(SEED_LINES), {"after_id": after_id, "last_id": last_id})
+            conn.commit()
+            print(f"history: {last}/{args.history} ({time.perf_counter() - started:.0f}s)")
+
+        rebuild_sales_daily(conn)
+        conn.execute(text("ANALYZE"))
+        conn.commit()
+    print(f"done in {time.perf_counter() - started:.0f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--history", type=int, default=5000000)
+    parser.add_argument("--months", type=int, default=24, help="history is spread over this many months")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=250000)
+    parser.add_argument("--seed", type=float, default=0.42, help="setseed() value, -1..1")
+    parser.add_argument("--no-lines", action="store_true", help="skip history_lines")
+    parser.add_argument("--reset", action="store_true", help="truncate items, history and rollups first")
+    parser.add_argument("--yes", action="store_true", help="confirm writing to the configured database")
+    arguments = parser.parse_args()
+    if not arguments.yes:
+        raise SystemExit(f"Refusing to seed {POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB} without --yes")
+    seed(arguments)
@@ -2,19 +2,34 @@ import asyncio
 import json
 from datetime import time
 
-import pandas as pd
 import schedule
 import telebot
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 
-from app.dependencies.database.database import get_db
-from app.models.item import Item
+from app.core.config import EXPORT_FORMAT
+from app.dependencies.database.database import warm_up_pool
+from app.dependencies.get_current_user import get_admin_user
+from app.schemas.user_schemas import User
 from app.routers.items_router import router as irouter
 from app.routers.user_router import router as urouter
 from app.routers.history_router import router as hrouter
-from app.utils.send_excel import fetch_data, write_to_excel, write_to_excel_default
+from app.routers.analytics_router import router as arouter
+from app.routers.health_router import router as health_router
+from app.routers.admin_router import router as admin_router
+from app.routers.pricelist_router import router as pricelist_router
+from app.utils.catalog_cache import ETAG_HEADER
+from app.utils.export import export_database
+from app.utils.history_partitions import maintain_history_partitions
+from app.utils.idempotency import REPLAYED_HEADER, sweep_idempotency_keys
+from app.utils.inventory_totals import verify_inventory_totals
+from app.utils.jobs import job_runner
+from app.utils.metrics import MetricsMiddleware
+from app.utils.pricelist import VARIANTS, last_sent_hash, mark_sent, pricelist_path, refresh_pricelists
+from app.utils.sales_daily import catch_up_sales_daily
+from app.utils.pagination import NEXT_CURSOR_HEADER, TOTAL_ESTIMATE_HEADER
+from app.utils.send_excel import fetch_data
 
 app = FastAPI()
 
@@ -28,11 +43,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, TOTAL_ESTIMATE_HEADER, ETAG_HEADER, REPLAYED_HEADER],
 )
+# Задержки по маршрутам и число SQL-запросов на запрос, отдаются в /metrics
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(urouter)
 app.include_router(irouter)
 app.include_router(hrouter)
+app.include_router(arouter)
+app.include_router(health_router)
+app.include_router(admin_router)
+app.include_router(pricelist_router)
 
 
 @app.get('/')
@@ -40,59 +62,75 @@ def root():
     return dict(message=f"all works")
 
 
+# last_error содержит текст исключения (в нём бывают адрес и пользователь БД), поэтому только для админа
+@app.get('/jobs/')
+def jobs(current_user: User = Depends(get_admin_user)):
+    return job_runner.snapshot()
+
+
 TOKEN = "TOKEN"
 bot = telebot.TeleBot(TOKEN)
 
 
 def export_to_excel(db: Session):
-    data = {}
-    data['History'] = pd.read_sql_table('history', db.bind)
-    data['Items'] = pd.read_sql_table('items', db.bind)
-    data['Users'] = pd.read_sql_table('users', db.bind)
-
-    data['History']['timestamp'] = data['History']['timestamp'].dt.tz_localize(None)
-
-    file_path = 'database_export.xlsx'
-    with pd.ExcelWriter(file_path) as writer:
-        for sheet_name, df in data.items():
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-    with open(file_path, 'rb') as file:
-        bot.send_document(IDIDID, file)
+    for file_path in export_database(db, 'database_export', EXPORT_FORMAT):
+        with open(file_path, 'rb') as file:
+            bot.send_document(IDIDID, file)
 
     print("Data exported to Excel file and sent to Telegram successfully")
 
 
 def schedule_export():
     export_time = time(hour=18, minute=15)
-    schedule.every().day.at(export_time.strftime('%H:%M')).do(lambda: export_to_excel(next(get_db())))
+    schedule.every().day.at(export_time.strftime('%H:%M')).do(job_runner.submit, 'export_to_excel', export_to_excel)
 
 
+# Файлы берутся из кэша прайс-листов; если с прошлой отправки товары не менялись, ничего не шлём
 def send_files_to_telegram(db: Session):
-    items = db.query(Item).order_by(Item.name).all()
-    items_json = [{'name': item.name, 'price': item.price, 'quantity': item.quantity} for item in items]
-
-    if items_json:
-        write_to_excel(items_json)
-        write_to_excel_default(items_json)
-    files = ["price.xlsx", "price_default.xlsx"]
-    for file in files:
-        with open(file, 'rb') as f:
-            bot.send_document(IDIDID, f)
+    manifest = refresh_pricelists(db)
+    if manifest is None:
+        print("Price lists are not generated yet")
+        return
+    if manifest["hash"] == last_sent_hash():
+        print("Price lists have not changed since the last upload")
+        return
+    for variant in VARIANTS:
+        with open(pricelist_path(manifest, variant), 'rb') as f:
+            bot.send_document(IDIDID, f, visible_file_name=f"{variant}.xlsx")
+    mark_sent(manifest)
     print("Files have been sent to Telegram successfully")
 
 
 def schedule_send_files():
-    schedule.every().day.at("03:00").do(lambda: send_files_to_telegram(next(get_db())))
-    schedule.every().day.at("16:00").do(lambda: send_files_to_telegram(next(get_db())))
+    schedule.every().day.at("03:00").do(job_runner.submit, 'send_files_to_telegram', send_files_to_telegram)
+    schedule.every().day.at("16:00").do(job_runner.submit, 'send_files_to_telegram', send_files_to_telegram)
+
+
+def schedule_maintenance():
+    schedule.every().hour.do(job_runner.submit, 'verify_inventory_totals', verify_inventory_totals)
+    schedule.every().day.at("01:00").do(job_runner.submit, 'maintain_history_partitions', maintain_history_partitions)
+    schedule.every().day.at("00:30").do(job_runner.submit, 'catch_up_sales_daily', catch_up_sales_daily)
+    schedule.every().hour.do(job_runner.submit, 'sweep_idempotency_keys', sweep_idempotency_keys)
+    # Раз в минуту сверяет версию склада, прайс-листы пересобираются только после изменений
+    schedule.every().minute.do(job_runner.submit, 'refresh_pricelists', refresh_pricelists)
+    # Партиции на ближайшие месяцы проверяем и при старте, не дожидаясь ночи
+    job_runner.submit('maintain_history_partitions', maintain_history_partitions)
+    job_runner.submit('refresh_pricelists', refresh_pricelists)
+
+
+@app.on_event("startup")
+async def warm_up_database_pool():
+    await warm_up_pool()
 
 
 @app.on_event("startup")
 async def startup_event():
     schedule_export()
     schedule_send_files()
+    schedule_maintenance()
 
 
+# run_pending только передаёт задачи в job_runner, сами задачи event loop не блокируют
 async def run_schedule():
     while True:
         schedule.run_pending()
@@ -102,3 +140,8 @@ async def run_schedule():
 @app.on_event("startup")
 async def run_schedule_task():
     asyncio.create_task(run_schedule())
+
+
+@app.on_event("shutdown")
+async def shutdown_jobs():
+    job_runner.shutdown()
@@ -0,0 +1,80 @@
+"""history payloads jsonb
+
+Revision ID: 3c398b97803e
+Revises: f7cec27b2d86
+Create Date: 2026-10-18 15:24:09.671532
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c398b97803e'
+down_revision: Union[str, None] = 'f7cec27b2d86'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PAYLOAD_COLUMNS = ['before_change', 'after_change']
+BATCH_SIZE = 5000
+
+
+def _parse(payload):
+    if payload is None:
+        return None
+    try:
+        return json.loads(payload.replace('\\"', ''))
+    except ValueError:
+        # Не разбирается - сохраняем исходную строку как JSON-строку, чтобы ничего не потерять
+        return payload
+
+
+def upgrade() -> None:
+    for column in PAYLOAD_COLUMNS:
+        op.add_column('history', sa.Column(f'{column}_jsonb', postgresql.JSONB(), nullable=True))
+
+    history = sa.table(
+        'history',
+        sa.column('id', sa.Integer),
+        sa.column('before_change', sa.Text),
+        sa.column('after_change', sa.Text),
+        sa.column('before_change_jsonb', postgresql.JSONB(none_as_null=True)),
+        sa.column('after_change_jsonb', postgresql.JSONB(none_as_null=True)),
+    )
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(history.c.id, history.c.before_change, history.c.after_change)
+            .where(history.c.id > last_id)
+            .order_by(history.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        conn.execute(
+            history.update().where(history.c.id == sa.bindparam('_id')).values(
+                before_change_jsonb=sa.bindparam('_before'),
+                after_change_jsonb=sa.bindparam('_after'),
+            ),
+            [{'_id': row.id, '_before': _parse(row.before_change), '_after': _parse(row.after_change)}
+             for row in rows],
+        )
+        last_id = rows[-1].id
+
+    for column in PAYLOAD_COLUMNS:
+        op.drop_column('history', column)
+        op.alter_column('history', f'{column}_jsonb', new_column_name=column)
+
+    op.create_index('ix_history_after_change', 'history', ['after_change'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'after_change': 'jsonb_path_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_history_after_change', table_name='history')
+    for column in PAYLOAD_COLUMNS:
+        op.alter_column('history', column, type_=sa.Text(), postgresql_using=f'{column}::text')
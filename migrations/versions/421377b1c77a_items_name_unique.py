@@ -0,0 +1,47 @@
+"""items name unique
+
+Revision ID: 421377b1c77a
+Revises: ba43975e3ddd
+Create Date: 2026-10-18 14:47:15.817551
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '421377b1c77a'
+down_revision: Union[str, None] = 'ba43975e3ddd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Сливаем дубли по имени в самую раннюю запись: количество суммируем, цену берём из последней
+    op.execute("""
+        UPDATE items
+        SET quantity = dup.quantity, price = dup.price
+        FROM (
+            SELECT min(id) AS keep_id,
+                   sum(quantity) AS quantity,
+                   (array_agg(price ORDER BY id DESC))[1] AS price
+            FROM items
+            GROUP BY name
+            HAVING count(*) > 1
+        ) AS dup
+        WHERE items.id = dup.keep_id
+    """)
+    op.execute("""
+        DELETE FROM items a
+        USING items b
+        WHERE a.name = b.name AND a.id > b.id
+    """)
+    op.drop_index(op.f('ix_items_name'), table_name='items')
+    op.create_index(op.f('ix_items_name'), 'items', ['name'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_items_name'), table_name='items')
+    op.create_index(op.f('ix_items_name'), 'items', ['name'], unique=False)
@@ -0,0 +1,124 @@
+"""partition history by month
+
+Revision ID: 764118b73cfa
+Revises: e4f042ce679d
+Create Date: 2026-10-18 15:03:28.014712
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '764118b73cfa'
+down_revision: Union[str, None] = 'e4f042ce679d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TRGM_COLUMNS = ['username', 'buyer', 'title', 'extra_info', 'history_type', 'item_names']
+COLUMNS = ('id, "timestamp", username, buyer, extra_info, before_change, after_change, history_type, title, '
+           'total_unique_items_count, total_items_count, total_price, item_names')
+# Партиции создаются на столько месяцев вперёд, дальше их досоздаёт задача расписания
+MONTHS_AHEAD = 2
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_history_table(name: str, id_default: str, partitioned: bool) -> None:
+    op.execute(f"""
+        CREATE TABLE {name} (
+            id integer NOT NULL DEFAULT {id_default},
+            "timestamp" timestamp with time zone NOT NULL DEFAULT now(),
+            username varchar,
+            buyer varchar,
+            extra_info text,
+            before_change jsonb,
+            after_change jsonb,
+            history_type varchar,
+            title varchar,
+            total_unique_items_count integer,
+            total_items_count integer,
+            total_price integer,
+            item_names text,
+            {'PRIMARY KEY (id, "timestamp")' if partitioned else 'PRIMARY KEY (id)'}
+        ){' PARTITION BY RANGE ("timestamp")' if partitioned else ''}
+    """)
+
+
+def _create_history_indexes() -> None:
+    op.create_index(op.f('ix_history_id'), 'history', ['id'], unique=False)
+    for column in TRGM_COLUMNS:
+        op.create_index(f'ix_history_{column}_trgm', 'history', [column], unique=False,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+    op.create_index('ix_history_after_change', 'history', ['after_change'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'after_change': 'jsonb_path_ops'})
+    op.create_index('ix_history_timestamp_id', 'history', ['timestamp', 'id'], unique=False)
+    op.create_index('ix_history_history_type_timestamp_id', 'history', ['history_type', 'timestamp', 'id'], unique=False)
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    sequence = conn.execute(sa.text("SELECT pg_get_serial_sequence('history', 'id')")).scalar()
+
+    op.execute('LOCK TABLE history IN ACCESS EXCLUSIVE MODE')
+    op.drop_constraint('history_lines_history_id_fkey', 'history_lines', type_='foreignkey')
+    op.execute('ALTER TABLE history RENAME TO history_unpartitioned')
+    op.execute('ALTER TABLE history_unpartitioned RENAME CONSTRAINT history_pkey TO history_unpartitioned_pkey')
+
+    # Ключ партиционирования входит в первичный ключ, поэтому timestamp больше не NULL
+    _create_history_table('history', f"nextval('{sequence}'::regclass)", partitioned=True)
+    op.execute('CREATE TABLE history_default PARTITION OF history DEFAULT')
+
+    first = conn.execute(sa.text(
+        'SELECT date_trunc(\'month\', min("timestamp") AT TIME ZONE \'UTC\')::date FROM history_unpartitioned'
+    )).scalar()
+    current = date.today().replace(day=1)
+    month = min(first or current, current)
+    while month <= _add_months(current, MONTHS_AHEAD):
+        following = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE history_{month:%Y_%m} PARTITION OF history "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{following.isoformat()} 00:00:00+00')"
+        )
+        month = following
+
+    op.execute(
+        f'INSERT INTO history ({COLUMNS}) '
+        f'SELECT id, coalesce("timestamp", \'epoch\'), username, buyer, extra_info, before_change, after_change, '
+        f'history_type, title, total_unique_items_count, total_items_count, total_price, item_names '
+        f'FROM history_unpartitioned'
+    )
+    op.execute(f'ALTER SEQUENCE {sequence} OWNED BY history.id')
+    op.drop_table('history_unpartitioned')
+    _create_history_indexes()
+
+    # Внешний ключ на партиционированную таблицу должен включать ключ партиционирования
+    op.execute(
+        'UPDATE history_lines l SET "timestamp" = h."timestamp" FROM history h '
+        'WHERE h.id = l.history_id AND l."timestamp" IS DISTINCT FROM h."timestamp"'
+    )
+    op.create_foreign_key('history_lines_history_id_fkey', 'history_lines', 'history',
+                          ['history_id', 'timestamp'], ['id', 'timestamp'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    sequence = conn.execute(sa.text("SELECT pg_get_serial_sequence('history', 'id')")).scalar()
+
+    op.drop_constraint('history_lines_history_id_fkey', 'history_lines', type_='foreignkey')
+    op.execute('ALTER TABLE history RENAME TO history_partitioned')
+    op.execute('ALTER TABLE history_partitioned RENAME CONSTRAINT history_pkey TO history_partitioned_pkey')
+    _create_history_table('history', f"nextval('{sequence}'::regclass)", partitioned=False)
+    op.execute(f'INSERT INTO history ({COLUMNS}) SELECT {COLUMNS} FROM history_partitioned')
+    op.execute(f'ALTER SEQUENCE {sequence} OWNED BY history.id')
+    op.execute('DROP TABLE history_partitioned CASCADE')
+    _create_history_indexes()
+    op.create_foreign_key('history_lines_history_id_fkey', 'history_lines', 'history',
+                          ['history_id'], ['id'], ondelete='CASCADE')
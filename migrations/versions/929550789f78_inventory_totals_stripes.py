@@ -0,0 +1,112 @@
+"""inventory totals stripes
+
+Revision ID: 929550789f78
+Revises: d31eb50ead44
+Create Date: 2026-10-18 15:41:04.962310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '929550789f78'
+down_revision: Union[str, None] = 'd31eb50ead44'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Одна строка итогов держала блокировку каждой транзакции, менявшей items, до её коммита, и все
+# продажи и поставки шли по очереди. Теперь строк STRIPES, триггер пишет в строку своего backend
+# (соединение всегда пишет в одну и ту же строку, поэтому транзакции не ждут друг друга по кругу),
+# итоги и версия - суммы по строкам. Должно совпадать с app.models.inventory_totals.TOTALS_STRIPES.
+STRIPES = 16
+STRIPE = f"1 + pg_backend_pid() % {STRIPES}"
+
+APPLY_FUNCTION = """
+CREATE OR REPLACE FUNCTION inventory_totals_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE inventory_totals t
+        SET unique_items_count = t.unique_items_count + d.items,
+            total_items_count = t.total_items_count + d.quantity,
+            total_price = t.total_price + d.price
+        FROM (SELECT count(*) AS items,
+                     coalesce(sum(quantity), 0) AS quantity,
+                     coalesce(sum(price * quantity), 0) AS price
+              FROM new_rows) d
+        WHERE t.id = {row};
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE inventory_totals t
+        SET unique_items_count = t.unique_items_count - d.items,
+            total_items_count = t.total_items_count - d.quantity,
+            total_price = t.total_price - d.price
+        FROM (SELECT count(*) AS items,
+                     coalesce(sum(quantity), 0) AS quantity,
+                     coalesce(sum(price * quantity), 0) AS price
+              FROM old_rows) d
+        WHERE t.id = {row};
+    ELSE
+        UPDATE inventory_totals t
+        SET total_items_count = t.total_items_count + n.quantity - o.quantity,
+            total_price = t.total_price + n.price - o.price
+        FROM (SELECT coalesce(sum(quantity), 0) AS quantity,
+                     coalesce(sum(price * quantity), 0) AS price
+              FROM new_rows) n,
+             (SELECT coalesce(sum(quantity), 0) AS quantity,
+                     coalesce(sum(price * quantity), 0) AS price
+              FROM old_rows) o
+        WHERE t.id = {row};
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+RESET_FUNCTION = """
+CREATE OR REPLACE FUNCTION inventory_totals_reset() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE inventory_totals SET unique_items_count = 0, total_items_count = 0, total_price = 0{where};
+    RETURN NULL;
+END
+$$
+"""
+
+BUMP_FUNCTION = """
+CREATE OR REPLACE FUNCTION inventory_version_bump() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE inventory_totals SET version = version + 1 WHERE id = {row};
+    RETURN NULL;
+END
+$$
+"""
+
+
+def upgrade() -> None:
+    op.drop_constraint('ck_inventory_totals_single_row', 'inventory_totals', type_='check')
+    op.create_check_constraint('ck_inventory_totals_stripe', 'inventory_totals', f'id BETWEEN 1 AND {STRIPES}')
+    op.execute(
+        'INSERT INTO inventory_totals (id, unique_items_count, total_items_count, total_price, version) '
+        f'SELECT id, 0, 0, 0, 0 FROM generate_series(1, {STRIPES}) id ON CONFLICT (id) DO NOTHING'
+    )
+    op.execute(APPLY_FUNCTION.format(row=STRIPE))
+    op.execute(RESET_FUNCTION.format(where=""))
+    op.execute(BUMP_FUNCTION.format(row=STRIPE))
+
+
+def downgrade() -> None:
+    # Строки сворачиваются в id = 1; версия остаётся суммой, поэтому кэши не примут её за старую
+    op.execute('LOCK TABLE inventory_totals IN EXCLUSIVE MODE')
+    op.execute(
+        'UPDATE inventory_totals t SET unique_items_count = s.unique_items_count, '
+        'total_items_count = s.total_items_count, total_price = s.total_price, version = s.version '
+        'FROM (SELECT sum(unique_items_count) AS unique_items_count, sum(total_items_count) AS total_items_count, '
+        'sum(total_price) AS total_price, sum(version) AS version FROM inventory_totals) s WHERE t.id = 1'
+    )
+    op.execute('DELETE FROM inventory_totals WHERE id <> 1')
+    op.drop_constraint('ck_inventory_totals_stripe', 'inventory_totals', type_='check')
+    op.create_check_constraint('ck_inventory_totals_single_row', 'inventory_totals', 'id = 1')
+    op.execute(APPLY_FUNCTION.format(row="1"))
+    op.execute(RESET_FUNCTION.format(where=" WHERE id = 1"))
+    op.execute(BUMP_FUNCTION.format(row="1"))
@@ -0,0 +1,44 @@
+"""inventory version
+
+Revision ID: a7584012d8e1
+Revises: e73bb31f65c3
+Create Date: 2026-10-18 15:00:58.869028
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7584012d8e1'
+down_revision: Union[str, None] = 'e73bb31f65c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Версия каталога: растёт на каждый оператор, изменивший items, и видна всем воркерам после коммита
+BUMP_FUNCTION = """
+CREATE FUNCTION inventory_version_bump() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE inventory_totals SET version = version + 1 WHERE id = 1;
+    RETURN NULL;
+END
+$$
+"""
+
+
+def upgrade() -> None:
+    op.add_column('inventory_totals', sa.Column('version', sa.BigInteger(), server_default='0', nullable=False))
+    op.execute(BUMP_FUNCTION)
+    op.execute(
+        'CREATE TRIGGER items_inventory_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON items '
+        'FOR EACH STATEMENT EXECUTE FUNCTION inventory_version_bump()'
+    )
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER IF EXISTS items_inventory_version ON items')
+    op.execute('DROP FUNCTION IF EXISTS inventory_version_bump()')
+    op.drop_column('inventory_totals', 'version')
@@ -0,0 +1,30 @@
+"""keyset pagination indexes
+
+Revision ID: c4d6ed8aa0e6
+Revises: eccfc7669da4
+Create Date: 2026-10-18 16:05:37.114825
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d6ed8aa0e6'
+down_revision: Union[str, None] = 'eccfc7669da4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_history_timestamp_id', 'history', ['timestamp', 'id'], unique=False)
+    op.create_index('ix_history_history_type_timestamp_id', 'history', ['history_type', 'timestamp', 'id'], unique=False)
+    op.create_index('ix_items_name_id', 'items', ['name', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_items_name_id', table_name='items')
+    op.drop_index('ix_history_history_type_timestamp_id', table_name='history')
+    op.drop_index('ix_history_timestamp_id', table_name='history')
@@ -0,0 +1,43 @@
+"""sales daily rollup
+
+Revision ID: e4770aee11e3
+Revises: 764118b73cfa
+Create Date: 2026-10-18 15:05:27.158834
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4770aee11e3'
+down_revision: Union[str, None] = '764118b73cfa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('sales_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('history_type', sa.String(), nullable=False),
+    sa.Column('username', sa.String(), nullable=False),
+    sa.Column('operations_count', sa.Integer(), nullable=False),
+    sa.Column('unique_items_count', sa.BigInteger(), nullable=False),
+    sa.Column('items_count', sa.BigInteger(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'history_type', 'username')
+    )
+    op.execute("""
+        INSERT INTO sales_daily (day, history_type, username, operations_count, unique_items_count, items_count, revenue)
+        SELECT date(timezone('UTC', "timestamp")), coalesce(history_type, ''), coalesce(username, ''), count(*),
+               coalesce(sum(total_unique_items_count), 0), coalesce(sum(total_items_count), 0),
+               coalesce(sum(total_price), 0)
+        FROM history
+        GROUP BY 1, 2, 3
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('sales_daily')
@@ -0,0 +1,28 @@
+"""items name trigram index
+
+Revision ID: e4f042ce679d
+Revises: a7584012d8e1
+Create Date: 2026-10-18 15:02:09.040913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4f042ce679d'
+down_revision: Union[str, None] = 'a7584012d8e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # pg_trgm уже создан миграцией f7cec27b2d86
+    op.create_index('ix_items_name_trgm', 'items', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_items_name_trgm', table_name='items', postgresql_using='gin')
@@ -0,0 +1,117 @@
+"""inventory totals
+
+Revision ID: e73bb31f65c3
+Revises: c4d6ed8aa0e6
+Create Date: 2026-10-18 14:58:44.624462
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e73bb31f65c3'
+down_revision: Union[str, None] = 'c4d6ed8aa0e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Дельты считаются по transition tables, поэтому upsert поставки или UPDATE продажи
+# на много позиций обновляет строку итогов один раз за оператор, а не на каждую строку
+APPLY_FUNCTION = """
+CREATE FUNCTION inventory_totals_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE inventory_totals t
+        SET unique_items_count = t.unique_items_count + d.items,
+            total_items_count = t.total_items_count + d.quantity,
+            total_price = t.total_price + d.price
+        FROM (SELECT count(*) AS items,
+                     coalesce(sum(quantity), 0) AS quantity,
+                     coalesce(sum(price * quantity), 0) AS price
+              FROM new_rows) d
+        WHERE t.id = 1;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE inventory_totals t
+        SET unique_items_count = t.unique_items_count - d.items,
+            total_items_count = t.total_items_count - d.quantity,
+            total_price = t.total_price - d.price
+        FROM (SELECT count(*) AS items,
+                     coalesce(sum(quantity), 0) AS quantity,
+                     coalesce(sum(price * quantity), 0) AS price
+              FROM old_rows) d
+        WHERE t.id = 1;
+    ELSE
+        UPDATE inventory_totals t
+        SET total_items_count = t.total_items_count + n.quantity - o.quantity,
+            total_price = t.total_price + n.price - o.price
+        FROM (SELECT coalesce(sum(quantity), 0) AS quantity,
+                     coalesce(sum(price * quantity), 0) AS price
+              FROM new_rows) n,
+             (SELECT coalesce(sum(quantity), 0) AS quantity,
+                     coalesce(sum(price * quantity), 0) AS price
+              FROM old_rows) o
+        WHERE t.id = 1;
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+RESET_FUNCTION = """
+CREATE FUNCTION inventory_totals_reset() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE inventory_totals SET unique_items_count = 0, total_items_count = 0, total_price = 0 WHERE id = 1;
+    RETURN NULL;
+END
+$$
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        'inventory_totals',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('unique_items_count', sa.BigInteger(), nullable=False),
+        sa.Column('total_items_count', sa.BigInteger(), nullable=False),
+        sa.Column('total_price', sa.Float(), nullable=False),
+        sa.CheckConstraint('id = 1', name='ck_inventory_totals_single_row'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # Блокировка items на время заполнения, чтобы между подсчётом и созданием триггеров не потерять изменения
+    op.execute('LOCK TABLE items IN SHARE ROW EXCLUSIVE MODE')
+    op.execute(
+        'INSERT INTO inventory_totals (id, unique_items_count, total_items_count, total_price) '
+        'SELECT 1, count(*), coalesce(sum(quantity), 0), coalesce(sum(price * quantity), 0) FROM items'
+    )
+
+    op.execute(APPLY_FUNCTION)
+    op.execute(RESET_FUNCTION)
+    op.execute(
+        'CREATE TRIGGER items_totals_insert AFTER INSERT ON items '
+        'REFERENCING NEW TABLE AS new_rows '
+        'FOR EACH STATEMENT EXECUTE FUNCTION inventory_totals_apply()'
+    )
+    op.execute(
+        'CREATE TRIGGER items_totals_update AFTER UPDATE ON items '
+        'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows '
+        'FOR EACH STATEMENT EXECUTE FUNCTION inventory_totals_apply()'
+    )
+    op.execute(
+        'CREATE TRIGGER items_totals_delete AFTER DELETE ON items '
+        'REFERENCING OLD TABLE AS old_rows '
+        'FOR EACH STATEMENT EXECUTE FUNCTION inventory_totals_apply()'
+    )
+    op.execute(
+        'CREATE TRIGGER items_totals_truncate AFTER TRUNCATE ON items '
+        'FOR EACH STATEMENT EXECUTE FUNCTION inventory_totals_reset()'
+    )
+
+
+def downgrade() -> None:
+    for trigger in ('items_totals_insert', 'items_totals_update', 'items_totals_delete', 'items_totals_truncate'):
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger} ON items')
+    op.execute('DROP FUNCTION IF EXISTS inventory_totals_apply()')
+    op.execute('DROP FUNCTION IF EXISTS inventory_totals_reset()')
+    op.drop_table('inventory_totals')
@@ -0,0 +1,46 @@
+"""history lines
+
+Revision ID: eccfc7669da4
+Revises: 3c398b97803e
+Create Date: 2026-10-18 15:41:52.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'eccfc7669da4'
+down_revision: Union[str, None] = '3c398b97803e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('history_lines',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('history_id', sa.Integer(), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=True),
+    sa.Column('price', sa.Float(), nullable=True),
+    sa.Column('history_type', sa.String(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['history_id'], ['history.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['item_id'], ['items.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_history_lines_id'), 'history_lines', ['id'], unique=False)
+    op.create_index(op.f('ix_history_lines_history_id'), 'history_lines', ['history_id'], unique=False)
+    op.create_index('ix_history_lines_item_id_timestamp', 'history_lines', ['item_id', 'timestamp'], unique=False)
+    op.create_index('ix_history_lines_timestamp', 'history_lines', ['timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_history_lines_timestamp', table_name='history_lines')
+    op.drop_index('ix_history_lines_item_id_timestamp', table_name='history_lines')
+    op.drop_index(op.f('ix_history_lines_history_id'), table_name='history_lines')
+    op.drop_index(op.f('ix_history_lines_id'), table_name='history_lines')
+    op.drop_table('history_lines')
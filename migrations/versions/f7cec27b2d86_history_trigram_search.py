@@ -0,0 +1,73 @@
+"""history trigram search
+
+Revision ID: f7cec27b2d86
+Revises: 421377b1c77a
+Create Date: 2026-10-18 15:02:41.218306
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7cec27b2d86'
+down_revision: Union[str, None] = '421377b1c77a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRGM_COLUMNS = ['username', 'buyer', 'title', 'extra_info', 'history_type', 'item_names']
+BATCH_SIZE = 5000
+
+
+def _names(payload):
+    if not payload:
+        return []
+    try:
+        data = json.loads(payload.replace('\\"', ''))
+    except ValueError:
+        return []
+    return [item['name'] for item in data if isinstance(item, dict) and item.get('name')]
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.add_column('history', sa.Column('item_names', sa.Text(), nullable=True))
+
+    history = sa.table(
+        'history',
+        sa.column('id', sa.Integer),
+        sa.column('before_change', sa.Text),
+        sa.column('after_change', sa.Text),
+        sa.column('item_names', sa.Text),
+    )
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(history.c.id, history.c.before_change, history.c.after_change)
+            .where(history.c.id > last_id)
+            .order_by(history.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        conn.execute(
+            history.update().where(history.c.id == sa.bindparam('_id')).values(item_names=sa.bindparam('_names')),
+            [{'_id': row.id,
+              '_names': '\n'.join(dict.fromkeys(_names(row.before_change) + _names(row.after_change)))}
+             for row in rows],
+        )
+        last_id = rows[-1].id
+
+    for column in TRGM_COLUMNS:
+        op.create_index(f'ix_history_{column}_trgm', 'history', [column], unique=False,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    for column in TRGM_COLUMNS:
+        op.drop_index(f'ix_history_{column}_trgm', table_name='history')
+    op.drop_column('history', 'item_names')